@@ -1,19 +1,162 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import os
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from small_giants.baseline import baseline_forecast
+from small_giants.batch import forecast_portfolio, forecast_results, recommend_portfolio
+from small_giants.cache import LRUCache, evict_oldest
+from small_giants.charts import MARKER_THRESHOLD, line_trace
+from small_giants.dataset import CompactSales
+from small_giants.forecasting import MIN_FORECAST_POINTS, ModelCache, prewarm
+from small_giants.hierarchy import hierarchical_forecast
+from small_giants.ingestion import DateFormatError, SalesCache, missing_columns
+from small_giants.jobs import JobQueue, QueueFull
+from small_giants.profiling import RunProfiler, StageTimer, stage
+from small_giants.simulation import forecast_arrays, simulate_inventory
+from small_giants.inventory import inventory_recommendation, summarize_portfolio
+
 st.set_page_config(
     page_title="Small Giants - Demand Forecasting", 
     page_icon="🦗", 
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_sales_cache():
+    # Shared by every session and rerun, so the same upload is parsed only once
+    return SalesCache(max_entries=8, cache_dir=os.environ.get("SMALL_GIANTS_CACHE_DIR"))
+
+
+@st.cache_resource(max_entries=8)
+def get_dataset(data_hash, _df):
+    # One read-only columnar copy per upload, shared by every session; with a cache
+    # directory it is a memory-mapped Arrow file shared by every server process too
+    cache_dir = os.environ.get("SMALL_GIANTS_CACHE_DIR")
+    if not cache_dir:
+        return CompactSales.from_frame(_df)
+    path = os.path.join(cache_dir, f"{data_hash}.arrow")
+    if not os.path.exists(path):
+        CompactSales.from_frame(_df).save(path)
+        evict_oldest(cache_dir, '.arrow', 32)
+    return CompactSales.open(path)
+
+
+@st.cache_resource
+def get_model_cache():
+    # Fitted models only depend on the data, SKU and Prophet config, never on the reorder sliders
+    return ModelCache(cache_dir=model_cache_dir())
+
+
+@st.cache_resource(max_entries=8)
+def get_baseline_forecast(data_hash, forecast_days, _df):
+    # One vectorized pass over every SKU; `_df` is identified by `data_hash`
+    return baseline_forecast(_df, forecast_days)
+
+
+@st.cache_resource(max_entries=8)
+def get_hierarchical_forecast(data_hash, forecast_days, _df):
+    # One Prophet fit per product family plus the total, reconciled down to every SKU
+    return hierarchical_forecast(_df, forecast_days, cache_dir=model_cache_dir())
+
+
+@st.cache_resource
+def get_catalog_forecasts():
+    # Finished catalog runs by (data hash, horizon, model), shared by every session:
+    # the reorder sliders only redo the recommendation arithmetic, never the fits
+    return LRUCache(8)
+
+
+@st.cache_resource
+def get_job_queue():
+    # Bounded so a burst of users queues up instead of saturating the server
+    return JobQueue(max_workers=max(1, (os.cpu_count() or 2) // 2), max_pending=32)
+
+
+def run_forecast_job(data_hash, sku, daily_sales, forecast_days, progress):
+    # Runs on a job thread: stages are timed into the job's own timer and returned with the forecast
+    timer = StageTimer(sku=sku)
+    with timer.activate():
+        model_cache = get_model_cache()
+        model_cache.get_model(data_hash, sku, daily_sales)
+        progress(0.8)
+        return model_cache.forecast(data_hash, sku, daily_sales, forecast_days), timer.records
+
+
+@st.cache_resource(max_entries=16)
+def get_portfolio_summary(data_hash, forecast_days, lead_time_days, safety_stock_days,
+                          service_level, lead_time_std, forecast_model, _df):
+    # Historical summary with status from simulating the baseline (or reconciled family) forecast of every SKU at once
+    summary = summarize_portfolio(_df, safety_stock_days)
+    if forecast_model == "hierarchical":
+        forecast, _ = get_hierarchical_forecast(data_hash, forecast_days, _df)
+    else:
+        forecast, _ = get_baseline_forecast(data_hash, forecast_days, _df)
+    sim = simulate_inventory(*forecast_arrays(forecast, summary['sku']), summary['current_stock'],
+                             lead_time_days, safety_stock_days, service_level, lead_time_std)
+    summary['status'] = sim['status'].to_numpy()
+    summary['stockout_probability'] = sim['stockout_probability'].to_numpy()
+    summary['recommended_order'] = sim['recommended_order'].to_numpy()
+    return summary
+
+
+@st.cache_resource
+def start_prewarm():
+    # Once per server process, after the first page is sent: Prophet and cmdstan
+    # load on a job thread while the user is still picking a file
+    if os.environ.get("SMALL_GIANTS_PREWARM", "1") == "0":
+        return None
+    try:
+        return get_job_queue().submit("prewarm", prewarm)
+    except QueueFull:
+        return None
+
+
+def model_cache_dir():
+    cache_dir = os.environ.get("SMALL_GIANTS_CACHE_DIR")
+    return os.path.join(cache_dir, "models") if cache_dir else None
+
+
+def portfolio_table(results, language):
+    # Catalog results formatted for planners: recommendations, or the error of a failed SKU
+    rows = []
+    for result in results:
+        if result['error']:
+            rows.append({
+                'SKU': result['sku'],
+                'Modello' if language == "Italiano" else 'Model': result['model'],
+                'Errore' if language == "Italiano" else 'Error': result['error']
+            })
+            continue
+        rows.append({
+            'SKU': result['sku'],
+            'Modello' if language == "Italiano" else 'Model': result['model'],
+            'Stock Attuale' if language == "Italiano" else 'Current Stock': f"{result['current_inventory']:,.0f}",
+            'Domanda Prevista' if language == "Italiano" else 'Forecasted Demand': f"{result['period_forecast']:,.0f}",
+            'Ordine Raccomandato' if language == "Italiano" else 'Recommended Order': f"{result['recommended_order']:,.0f}",
+            'Giorni di Stock' if language == "Italiano" else 'Days of Stock': f"{result['days_of_stock']:.1f}" if result['days_of_stock'] != float('inf') else "∞"
+        })
+    return pd.DataFrame(rows)
+
+
+JOB_POLL_SECONDS = 0.5
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_key, language):
+    # Reruns on its own while the job runs; one full rerun then shows the finished forecast
+    job = get_job_queue().get(job_key)
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=("In coda..." if job.status == "queued" else "Addestramento modello...")
+                if language == "Italiano" else
+                ("Queued..." if job.status == "queued" else "Fitting model..."))
+
 # Custom CSS for Small Giants branding
 st.markdown("""
 <style>
@@ -59,14 +202,31 @@ st.sidebar.markdown("*Ottimizza le previsioni per Small Giants*")
 forecast_days = st.sidebar.slider("Periodo di Previsione (giorni)", 30, 365, 90, help="Quanto lontano nel futuro prevedere la domanda")
 safety_stock_days = st.sidebar.slider("Scorta di Sicurezza (giorni)", 7, 30, 14, help="Giorni extra di inventario come buffer")
 lead_time_days = st.sidebar.slider("Tempo di Consegna (giorni)", 1, 30, 7, help="Giorni necessari per ricevere nuovo stock")
+lead_time_std = st.sidebar.slider("Variabilità Consegna (giorni)", 0, 10, 0, help="Deviazione standard del tempo di consegna nella simulazione")
+service_level = st.sidebar.slider("Livello di Servizio (%)", 80, 99, 95, help="Probabilità target di non andare in rottura di stock") / 100
 
 # Language toggle
 language = st.sidebar.selectbox("Lingua / Language", ["Italiano", "English"])
 
-# Small Giants product suggestions
-st.sidebar.markdown("---")
-st.sidebar.subheader("🦗 Prodotti Small Giants")
-st.sidebar.markdown("""
+# Forecast tier: the cheap vectorized models, Prophet, or per-SKU automatic selection
+model_labels = {"auto": "Automatico", "prophet": "Prophet", "baseline": "Rapido (baseline)",
+                "hierarchical": "Per famiglia (gerarchico)"}
+forecast_model = st.sidebar.selectbox("Modello di Previsione", list(model_labels), format_func=model_labels.get,
+                                      help="Automatico usa Prophet solo per gli SKU con storico lungo e regolare; "
+                                           "Per famiglia stima Prophet per famiglia di prodotto e lo ripartisce sugli SKU")
+
+# Per-stage timings of this rerun, shown in the diagnostics panel and appended to SMALL_GIANTS_METRICS_LOG
+rerun_timer = StageTimer(source="app").install()
+diagnostics = st.sidebar.checkbox("🔧 Diagnostica prestazioni", help="Tempi di ogni fase per questo rerun")
+profiler = None
+if diagnostics and st.sidebar.button("Profila questo rerun", help="cProfile + tracemalloc per un singolo rerun"):
+    profiler = RunProfiler().start()
+
+try:
+    # Small Giants product suggestions
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🦗 Prodotti Small Giants")
+    st.sidebar.markdown("""
 **Esempi SKU per il file Excel:**
 - `CRACKER-ROSMARINO-TIMO`
 - `CRACKER-LIME-PEPE`
@@ -82,311 +242,405 @@ st.sidebar.markdown("""
 - `GRATTUGIATO-LIEVITO`
 """)
 
-# File uploader
-uploaded_file = st.file_uploader(
-    "Scegli il tuo file Excel" if language == "Italiano" else "Choose your Excel file", 
-    type=['xlsx', 'xls'],
-    help="Il file dovrebbe avere le colonne: date, sku, units_sold, on_hand_end"
-)
+    # File uploader
+    uploaded_file = st.file_uploader(
+        "Scegli il tuo file Excel" if language == "Italiano" else "Choose your Excel file", 
+        type=['xlsx', 'xls'],
+        help="Il file dovrebbe avere le colonne: date, sku, units_sold, on_hand_end"
+    )
 
-if uploaded_file is not None:
-    try:
-        # Read the Excel file
-        df = pd.read_excel(uploaded_file)
-        
-        # Display basic info about the data
-        st.subheader("📋 Panoramica Dati" if language == "Italiano" else "📋 Data Overview")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Righe Totali" if language == "Italiano" else "Total Rows", len(df))
-        with col2:
-            st.metric("SKU Unici" if language == "Italiano" else "Unique SKUs", 
-                     df['sku'].nunique() if 'sku' in df.columns else 0)
-        with col3:
-            if 'date' in df.columns:
-                date_range = f"{df['date'].dt.date.min()} → {df['date'].dt.date.max()}"
-            else:
-                date_range = "N/A"
-            st.metric("Periodo" if language == "Italiano" else "Date Range", date_range)
-        with col4:
-            total_units = df['units_sold'].sum() if 'units_sold' in df.columns else 0
-            st.metric("Unità Vendute Totali" if language == "Italiano" else "Total Units Sold", 
-                     f"{total_units:,.0f}")
-        
-        # Show first few rows
-        st.write("**Prime 5 righe dei tuoi dati:**" if language == "Italiano" else "**First 5 rows of your data:**")
-        st.dataframe(df.head())
-        
-        # Check required columns
-        required_columns = ['date', 'sku', 'units_sold', 'on_hand_end']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            st.error(f"❌ Colonne mancanti: {missing_columns}" if language == "Italiano" 
-                    else f"❌ Missing required columns: {missing_columns}")
-            st.write("**Colonne richieste:** date, sku, units_sold, on_hand_end" if language == "Italiano"
-                    else "**Required columns:** date, sku, units_sold, on_hand_end")
-        else:
-            st.success("✅ Tutte le colonne richieste trovate!" if language == "Italiano" 
-                      else "✅ All required columns found!")
-            
-            # Convert date column to datetime
+    if uploaded_file is not None:
+        try:
+            # Read the Excel file (cached by content hash, so reruns skip parsing)
             try:
-                df['date'] = pd.to_datetime(df['date'])
-            except Exception as e:
+                with stage('ingest'):
+                    data_hash, df = get_sales_cache().load(uploaded_file.getvalue(), uploaded_file.name)
+            except DateFormatError as e:
                 st.error(f"Errore nel formato data: {str(e)}" if language == "Italiano" 
                         else f"Date format error: {str(e)}")
                 st.info("Assicurati che le date siano nel formato YYYY-MM-DD (es. 2024-01-15)" if language == "Italiano"
                        else "Make sure dates are in YYYY-MM-DD format (e.g., 2024-01-15)")
                 st.stop()
+        
+            # Display basic info about the data
+            st.subheader("📋 Panoramica Dati" if language == "Italiano" else "📋 Data Overview")
+        
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Righe Totali" if language == "Italiano" else "Total Rows", len(df))
+            with col2:
+                st.metric("SKU Unici" if language == "Italiano" else "Unique SKUs", 
+                         df['sku'].nunique() if 'sku' in df.columns else 0)
+            with col3:
+                if 'date' in df.columns:
+                    date_range = f"{df['date'].dt.date.min()} → {df['date'].dt.date.max()}"
+                else:
+                    date_range = "N/A"
+                st.metric("Periodo" if language == "Italiano" else "Date Range", date_range)
+            with col4:
+                total_units = df['units_sold'].sum() if 'units_sold' in df.columns else 0
+                st.metric("Unità Vendute Totali" if language == "Italiano" else "Total Units Sold", 
+                         f"{total_units:,.0f}")
+        
+            # Show first few rows
+            st.write("**Prime 5 righe dei tuoi dati:**" if language == "Italiano" else "**First 5 rows of your data:**")
+            st.dataframe(df.head())
+        
+            # Check required columns
+            missing = missing_columns(df)
+        
+            if missing:
+                st.error(f"❌ Colonne mancanti: {missing}" if language == "Italiano" 
+                        else f"❌ Missing required columns: {missing}")
+                st.write("**Colonne richieste:** date, sku, units_sold, on_hand_end" if language == "Italiano"
+                        else "**Required columns:** date, sku, units_sold, on_hand_end")
+            else:
+                st.success("✅ Tutte le colonne richieste trovate!" if language == "Italiano" 
+                          else "✅ All required columns found!")
             
-            # SKU selector with Small Giants context
-            st.subheader("🦗 Analisi Prodotto Small Giants")
-            selected_sku = st.selectbox(
-                "Seleziona SKU per analisi dettagliata:" if language == "Italiano" 
-                else "Select SKU for detailed analysis:", 
-                df['sku'].unique()
-            )
+                # SKU selector with Small Giants context
+                st.subheader("🦗 Analisi Prodotto Small Giants")
+                selected_sku = st.selectbox(
+                    "Seleziona SKU per analisi dettagliata:" if language == "Italiano" 
+                    else "Select SKU for detailed analysis:", 
+                    df['sku'].unique()
+                )
             
-            # Filter data for selected SKU
-            sku_data = df[df['sku'] == selected_sku].copy()
-            sku_data = sku_data.sort_values('date')
+                # Rows for the selected SKU, sorted by date (views into the shared dataset)
+                with stage('dataset'):
+                    dataset = get_dataset(data_hash, df)
+                sku_data = dataset.sku_frame(selected_sku)
             
-            # Create two columns for charts
-            col1, col2 = st.columns(2)
+                # Plotly is only loaded once there is something to plot
+                import plotly.graph_objects as go
+
+                # Create two columns for charts
+                col1, col2 = st.columns(2)
             
-            with col1:
-                st.subheader(f"📈 Storico Vendite - {selected_sku}")
-                fig1 = px.line(sku_data, x='date', y='units_sold', 
-                              title=f"Vendite Giornaliere per {selected_sku}",
-                              color_discrete_sequence=['#2E8B57'])
-                fig1.update_layout(
-                    height=400,
-                    xaxis_title="Data",
-                    yaxis_title="Unità Vendute"
-                )
-                st.plotly_chart(fig1, use_container_width=True)
+                with col1:
+                    st.subheader(f"📈 Storico Vendite - {selected_sku}")
+                    # Long histories are downsampled server-side (LTTB, peaks and dips kept)
+                    fig1 = go.Figure(line_trace(sku_data['date'], sku_data['units_sold'], mode='lines',
+                                                line=dict(color='#2E8B57')))
+                    fig1.update_layout(
+                        title=f"Vendite Giornaliere per {selected_sku}",
+                        height=400,
+                        xaxis_title="Data",
+                        yaxis_title="Unità Vendute"
+                    )
+                    with stage('render_chart', chart='fig1'):
+                        st.plotly_chart(fig1, use_container_width=True)
             
-            with col2:
-                st.subheader(f"📦 Livelli Inventario - {selected_sku}")
-                fig2 = px.line(sku_data, x='date', y='on_hand_end', 
-                              title=f"Inventario Fine Giorno per {selected_sku}",
-                              color_discrete_sequence=['#FF6B35'])
-                fig2.update_layout(
-                    height=400,
-                    xaxis_title="Data",
-                    yaxis_title="Unità in Stock"
-                )
-                st.plotly_chart(fig2, use_container_width=True)
+                with col2:
+                    st.subheader(f"📦 Livelli Inventario - {selected_sku}")
+                    fig2 = go.Figure(line_trace(sku_data['date'], sku_data['on_hand_end'], mode='lines',
+                                                line=dict(color='#FF6B35')))
+                    fig2.update_layout(
+                        title=f"Inventario Fine Giorno per {selected_sku}",
+                        height=400,
+                        xaxis_title="Data",
+                        yaxis_title="Unità in Stock"
+                    )
+                    with stage('render_chart', chart='fig2'):
+                        st.plotly_chart(fig2, use_container_width=True)
             
-            # Prepare data for Prophet
-            if len(sku_data) >= 10:  # Need at least 10 data points for Prophet
-                # Aggregate daily sales (in case there are multiple entries per day)
-                daily_sales = sku_data.groupby('date')['units_sold'].sum().reset_index()
-                daily_sales.columns = ['ds', 'y']  # Prophet requires these column names
+                # Prepare data for Prophet
+                if len(sku_data) >= MIN_FORECAST_POINTS:
+                    daily_sales = dataset.daily_sales(selected_sku)
                 
-                st.subheader("🔮 Previsione Domanda AI" if language == "Italiano" else "🔮 AI Demand Forecast")
+                    st.subheader("🔮 Previsione Domanda AI" if language == "Italiano" else "🔮 AI Demand Forecast")
                 
-                with st.spinner("Generazione previsione AI... Un momento per favore." if language == "Italiano"
-                               else "Generating AI forecast... This may take a moment."):
-                    try:
-                        # Create and fit Prophet model
-                        model = Prophet(
-                            daily_seasonality=False,
-                            weekly_seasonality=True,
-                            yearly_seasonality=True if len(daily_sales) > 365 else False,
-                            interval_width=0.95
-                        )
-                        model.fit(daily_sales)
-                        
-                        # Make future dataframe
-                        future = model.make_future_dataframe(periods=forecast_days)
-                        forecast = model.predict(future)
+                    with st.spinner("Generazione previsione AI... Un momento per favore." if language == "Italiano"
+                                   else "Generating AI forecast... This may take a moment."):
+                        try:
+                            baseline, selection = get_baseline_forecast(data_hash, forecast_days, df)
+                            sku_selection = selection[selection['sku'] == selected_sku].iloc[0]
+                            if forecast_model == "prophet" or (forecast_model == "auto" and sku_selection['tier'] == "prophet"):
+                                # Fit (or reuse the cached) Prophet model in the shared background pool;
+                                # sessions asking for the same forecast join the same job
+                                job_key = (data_hash, selected_sku, forecast_days)
+                                # A failed fit is shown until the user asks for another attempt
+                                retry = st.session_state.pop("retry_forecast", None) == job_key
+                                try:
+                                    job = get_job_queue().submit(job_key, run_forecast_job, data_hash, selected_sku,
+                                                                 daily_sales, forecast_days, retry=retry)
+                                except QueueFull:
+                                    st.warning("⏳ Server occupato, riprova tra poco." if language == "Italiano"
+                                               else "⏳ Server busy, please try again shortly.")
+                                    st.stop()
+                                if not job.done:
+                                    # Only the progress bar polls; the rest of the page renders meanwhile
+                                    job_progress(job.key, language)
+                                    future_dates = None
+                                elif job.status == "failed":
+                                    st.button("🔄 Riprova previsione" if language == "Italiano" else "🔄 Retry forecast",
+                                              on_click=st.session_state.update, kwargs={"retry_forecast": job_key})
+                                    raise job.error
+                                else:
+                                    forecast, job_timings = job.result
+                                    # A finished job is reused by later reruns: its stages only ran once
+                                    merged_jobs = st.session_state.setdefault("merged_job_timings", set())
+                                    if job.id not in merged_jobs:
+                                        merged_jobs.add(job.id)
+                                        rerun_timer.extend(job_timings, source="job")
+                                    future_dates = forecast[forecast['ds'] > daily_sales['ds'].max()]
+                                model_name = "Prophet"
+                            elif forecast_model == "hierarchical":
+                                reconciled, hierarchy = get_hierarchical_forecast(data_hash, forecast_days, df)
+                                future_dates = reconciled[reconciled['sku'] == selected_sku]
+                                family = hierarchy.loc[hierarchy['sku'] == selected_sku, 'family'].iloc[0]
+                                model_name = f"Prophet {family} + {sku_selection['method']}"
+                            else:
+                                future_dates = baseline[baseline['sku'] == selected_sku]
+                                model_name = sku_selection['method']
+                            if future_dates is not None:
+                                st.caption(f"Modello: {model_name}" if language == "Italiano" else f"Model: {model_name}")
                         
-                        # Create forecast visualization
-                        fig3 = go.Figure()
+                                # Create forecast visualization
+                                fig3 = go.Figure()
                         
-                        # Historical data
-                        fig3.add_trace(go.Scatter(
-                            x=daily_sales['ds'], 
-                            y=daily_sales['y'],
-                            mode='markers+lines',
-                            name='Vendite Storiche' if language == "Italiano" else 'Historical Sales',
-                            line=dict(color='#2E8B57', width=3)
-                        ))
+                                # Historical data
+                                fig3.add_trace(line_trace(
+                                    daily_sales['ds'], 
+                                    daily_sales['y'],
+                                    mode='markers+lines' if len(daily_sales) <= MARKER_THRESHOLD else 'lines',
+                                    name='Vendite Storiche' if language == "Italiano" else 'Historical Sales',
+                                    line=dict(color='#2E8B57', width=3)
+                                ))
                         
-                        # Forecast line
-                        future_dates = forecast[forecast['ds'] > daily_sales['ds'].max()]
-                        fig3.add_trace(go.Scatter(
-                            x=future_dates['ds'],
-                            y=future_dates['yhat'],
-                            mode='lines',
-                            name='Previsione AI' if language == "Italiano" else 'AI Forecast',
-                            line=dict(color='#FF6B35', dash='dash', width=3)
-                        ))
+                                # Forecast line
+                                fig3.add_trace(go.Scatter(
+                                    x=future_dates['ds'],
+                                    y=future_dates['yhat'],
+                                    mode='lines',
+                                    name='Previsione AI' if language == "Italiano" else 'AI Forecast',
+                                    line=dict(color='#FF6B35', dash='dash', width=3)
+                                ))
                         
-                        # Confidence interval
-                        fig3.add_trace(go.Scatter(
-                            x=future_dates['ds'].tolist() + future_dates['ds'].tolist()[::-1],
-                            y=future_dates['yhat_upper'].tolist() + future_dates['yhat_lower'].tolist()[::-1],
-                            fill='tonexty',
-                            fillcolor='rgba(255,107,53,0.2)',
-                            line=dict(color='rgba(255,255,255,0)'),
-                            name='Intervallo di Confidenza' if language == "Italiano" else 'Confidence Interval',
-                            showlegend=True
-                        ))
+                                # Confidence interval
+                                fig3.add_trace(go.Scatter(
+                                    x=future_dates['ds'].tolist() + future_dates['ds'].tolist()[::-1],
+                                    y=future_dates['yhat_upper'].tolist() + future_dates['yhat_lower'].tolist()[::-1],
+                                    fill='tonexty',
+                                    fillcolor='rgba(255,107,53,0.2)',
+                                    line=dict(color='rgba(255,255,255,0)'),
+                                    name='Intervallo di Confidenza' if language == "Italiano" else 'Confidence Interval',
+                                    showlegend=True
+                                ))
                         
-                        fig3.update_layout(
-                            title=f"Previsione Domanda per {selected_sku} - Powered by Small Giants AI",
-                            xaxis_title="Data",
-                            yaxis_title="Unità Vendute",
-                            height=500,
-                            template="plotly_white"
-                        )
-                        st.plotly_chart(fig3, use_container_width=True)
+                                fig3.update_layout(
+                                    title=f"Previsione Domanda per {selected_sku} - Powered by Small Giants AI",
+                                    xaxis_title="Data",
+                                    yaxis_title="Unità Vendute",
+                                    height=500,
+                                    template="plotly_white"
+                                )
+                                with stage('render_chart', chart='fig3'):
+                                    st.plotly_chart(fig3, use_container_width=True)
                         
-                        # Calculate inventory recommendations
-                        st.subheader("📋 Raccomandazioni Inventario" if language == "Italiano" 
-                                   else "📋 Inventory Recommendations")
+                                # Calculate inventory recommendations
+                                st.subheader("📋 Raccomandazioni Inventario" if language == "Italiano" 
+                                           else "📋 Inventory Recommendations")
                         
-                        # Get current inventory
-                        current_inventory = sku_data['on_hand_end'].iloc[-1]
+                                rec = inventory_recommendation(
+                                    daily_sales, future_dates, sku_data['on_hand_end'].iloc[-1],
+                                    lead_time_days, safety_stock_days
+                                )
+                                current_inventory = rec['current_inventory']
+                                total_period = rec['total_period']
+                                period_forecast = rec['period_forecast']
+                                recommended_order = rec['recommended_order']
+                                avg_daily = rec['avg_daily']
+                                days_of_stock = rec['days_of_stock']
                         
-                        # Calculate forecasted demand for lead time + safety stock period
-                        total_period = lead_time_days + safety_stock_days
-                        period_forecast = future_dates.head(total_period)['yhat'].sum()
+                                # Display recommendations
+                                col1, col2, col3, col4 = st.columns(4)
+                                with col1:
+                                    st.metric("Stock Attuale" if language == "Italiano" else "Current Stock", 
+                                             f"{current_inventory:,.0f}")
+                                with col2:
+                                    help_text = f"Per i prossimi {total_period} giorni (consegna + sicurezza)" if language == "Italiano" else f"For next {total_period} days (lead time + safety stock)"
+                                    st.metric("Domanda Prevista" if language == "Italiano" else "Forecasted Demand", 
+                                             f"{period_forecast:,.0f}", help=help_text)
+                                with col3:
+                                    st.metric("Ordine Raccomandato" if language == "Italiano" else "Recommended Order", 
+                                             f"{recommended_order:,.0f}",
+                                             delta=f"{recommended_order - current_inventory:,.0f}")
+                                with col4:
+                                    st.metric("Giorni di Stock" if language == "Italiano" else "Days of Stock", 
+                                             f"{days_of_stock:.1f}" if days_of_stock != float('inf') else "∞")
                         
-                        # Calculate recommended order quantity
-                        recommended_order = max(0, period_forecast - current_inventory)
+                                # Monte Carlo simulation of demand over the lead time and protection period
+                                sim = simulate_inventory(
+                                    future_dates['yhat'].to_numpy()[None], future_dates['yhat_lower'].to_numpy()[None],
+                                    future_dates['yhat_upper'].to_numpy()[None], [current_inventory],
+                                    lead_time_days, safety_stock_days, service_level, lead_time_std
+                                ).iloc[0]
                         
-                        # Display recommendations
-                        col1, col2, col3, col4 = st.columns(4)
-                        with col1:
-                            st.metric("Stock Attuale" if language == "Italiano" else "Current Stock", 
-                                     f"{current_inventory:,.0f}")
-                        with col2:
-                            help_text = f"Per i prossimi {total_period} giorni (consegna + sicurezza)" if language == "Italiano" else f"For next {total_period} days (lead time + safety stock)"
-                            st.metric("Domanda Prevista" if language == "Italiano" else "Forecasted Demand", 
-                                     f"{period_forecast:,.0f}", help=help_text)
-                        with col3:
-                            st.metric("Ordine Raccomandato" if language == "Italiano" else "Recommended Order", 
-                                     f"{recommended_order:,.0f}",
-                                     delta=f"{recommended_order - current_inventory:,.0f}")
-                        with col4:
-                            avg_daily = daily_sales['y'].tail(30).mean() if len(daily_sales) >= 30 else daily_sales['y'].mean()
-                            days_of_stock = current_inventory / avg_daily if avg_daily > 0 else float('inf')
-                            st.metric("Giorni di Stock" if language == "Italiano" else "Days of Stock", 
-                                     f"{days_of_stock:.1f}" if days_of_stock != float('inf') else "∞")
+                                col1, col2, col3, col4 = st.columns(4)
+                                with col1:
+                                    st.metric("Prob. Rottura Stock" if language == "Italiano" else "Stockout Probability",
+                                             f"{sim['stockout_probability']:.0%}",
+                                             help="Entro il tempo di consegna, senza riordino" if language == "Italiano"
+                                             else "Within the lead time, without reordering")
+                                with col2:
+                                    st.metric("Fill Rate Atteso" if language == "Italiano" else "Expected Fill Rate",
+                                             f"{sim['fill_rate']:.1%}")
+                                with col3:
+                                    st.metric("Punto di Riordino (s)" if language == "Italiano" else "Reorder Point (s)",
+                                             f"{sim['reorder_point']:,.0f}")
+                                with col4:
+                                    st.metric("Ordine per Livello di Servizio" if language == "Italiano" else "Service-Level Order",
+                                             f"{sim['recommended_order']:,.0f}",
+                                             help=f"Fino a S = {sim['order_up_to']:,.0f}")
                         
-                        # Business insights
-                        st.markdown("---")
-                        st.subheader("💡 Insight Commerciali" if language == "Italiano" else "💡 Business Insights")
+                                # Business insights
+                                st.markdown("---")
+                                st.subheader("💡 Insight Commerciali" if language == "Italiano" else "💡 Business Insights")
                         
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if days_of_stock < safety_stock_days:
-                                st.error("🔴 CRITICO: Stock insufficiente!" if language == "Italiano" 
-                                        else "🔴 CRITICAL: Insufficient stock!")
-                                st.write(f"Rischio stockout in {days_of_stock:.1f} giorni" if language == "Italiano"
-                                        else f"Risk of stockout in {days_of_stock:.1f} days")
-                            elif days_of_stock < safety_stock_days * 2:
-                                st.warning("🟡 ATTENZIONE: Stock basso" if language == "Italiano" 
-                                          else "🟡 WARNING: Low stock")
-                            else:
-                                st.success("🟢 BUONO: Stock sufficiente" if language == "Italiano" 
-                                          else "🟢 GOOD: Sufficient stock")
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    if sim['status'] == 'critical':
+                                        st.error("🔴 CRITICO: Stock insufficiente!" if language == "Italiano" 
+                                                else "🔴 CRITICAL: Insufficient stock!")
+                                        st.write(f"Probabilità di rottura stock prima della consegna: {sim['stockout_probability']:.0%}" if language == "Italiano"
+                                                else f"Probability of a stockout before delivery: {sim['stockout_probability']:.0%}")
+                                    elif sim['status'] == 'warning':
+                                        st.warning("🟡 ATTENZIONE: Stock basso" if language == "Italiano" 
+                                                  else "🟡 WARNING: Low stock")
+                                    else:
+                                        st.success("🟢 BUONO: Stock sufficiente" if language == "Italiano" 
+                                                  else "🟢 GOOD: Sufficient stock")
                         
-                        with col2:
-                            velocity = avg_daily * 7  # Weekly velocity
-                            st.info(f"**Velocità settimanale media:** {velocity:.1f} unità" if language == "Italiano"
-                                   else f"**Average weekly velocity:** {velocity:.1f} units")
+                                with col2:
+                                    velocity = avg_daily * 7  # Weekly velocity
+                                    st.info(f"**Velocità settimanale media:** {velocity:.1f} unità" if language == "Italiano"
+                                           else f"**Average weekly velocity:** {velocity:.1f} units")
                         
-                    except Exception as e:
-                        st.error(f"Errore nella generazione della previsione: {str(e)}" if language == "Italiano"
-                                else f"Error generating forecast: {str(e)}")
-                        st.info("Prova con più dati storici (almeno 2 settimane)" if language == "Italiano"
-                               else "Try with more historical data (at least 2 weeks)")
+                        except Exception as e:
+                            st.error(f"Errore nella generazione della previsione: {str(e)}" if language == "Italiano"
+                                    else f"Error generating forecast: {str(e)}")
+                            st.info("Prova con più dati storici (almeno 2 settimane)" if language == "Italiano"
+                                   else "Try with more historical data (at least 2 weeks)")
                 
-                # Summary table for all SKUs
-                st.subheader("📊 Riepilogo Tutti i Prodotti Small Giants" if language == "Italiano" 
-                           else "📊 Summary for All Small Giants Products")
+                    # Summary table for all SKUs
+                    st.subheader("📊 Riepilogo Tutti i Prodotti Small Giants" if language == "Italiano" 
+                               else "📊 Summary for All Small Giants Products")
                 
-                summary_data = []
-                for sku in df['sku'].unique():
-                    sku_subset = df[df['sku'] == sku].copy()
-                    if len(sku_subset) >= 5:  # Lower threshold for summary
-                        # Get basic stats
-                        current_stock = sku_subset['on_hand_end'].iloc[-1]
-                        avg_daily_sales = sku_subset.groupby('date')['units_sold'].sum().mean()
-                        days_stock = current_stock / avg_daily_sales if avg_daily_sales > 0 else float('inf')
-                        
-                        # Status logic
-                        if days_stock < safety_stock_days:
-                            status = "🔴 Critico" if language == "Italiano" else "🔴 Critical"
-                        elif days_stock < safety_stock_days * 2:
-                            status = "🟡 Attenzione" if language == "Italiano" else "🟡 Warning"  
-                        else:
-                            status = "🟢 Buono" if language == "Italiano" else "🟢 Good"
-                        
-                        summary_data.append({
-                            'SKU': sku,
-                            'Stock Attuale' if language == "Italiano" else 'Current Stock': f"{current_stock:,.0f}",
-                            'Media Vendite/Giorno' if language == "Italiano" else 'Avg Daily Sales': f"{avg_daily_sales:.1f}",
-                            'Giorni di Stock' if language == "Italiano" else 'Days of Stock': f"{days_stock:.1f}" if days_stock != float('inf') else "∞",
-                            'Stato' if language == "Italiano" else 'Status': status
+                    summary = get_portfolio_summary(data_hash, forecast_days, lead_time_days, safety_stock_days,
+                                                    service_level, lead_time_std, forecast_model, df)
+                
+                    if len(summary):
+                        status_labels = {
+                            'critical': "🔴 Critico" if language == "Italiano" else "🔴 Critical",
+                            'warning': "🟡 Attenzione" if language == "Italiano" else "🟡 Warning",
+                            'good': "🟢 Buono" if language == "Italiano" else "🟢 Good"
+                        }
+                        summary_df = pd.DataFrame({
+                            'SKU': summary['sku'],
+                            'Stock Attuale' if language == "Italiano" else 'Current Stock': summary['current_stock'].map('{:,.0f}'.format),
+                            'Media Vendite/Giorno' if language == "Italiano" else 'Avg Daily Sales': summary['avg_daily_sales'].map('{:.1f}'.format),
+                            'Giorni di Stock' if language == "Italiano" else 'Days of Stock': summary['days_of_stock'].map(lambda d: f"{d:.1f}" if d != float('inf') else "∞"),
+                            'Prob. Rottura Stock' if language == "Italiano" else 'Stockout Probability': summary['stockout_probability'].map('{:.0%}'.format),
+                            'Ordine Raccomandato' if language == "Italiano" else 'Recommended Order': summary['recommended_order'].map('{:,.0f}'.format),
+                            'Stato' if language == "Italiano" else 'Status': summary['status'].map(status_labels)
                         })
+                        st.dataframe(summary_df, use_container_width=True)
+                    else:
+                        st.info("Non abbastanza dati per il riepilogo" if language == "Italiano" 
+                               else "Not enough data for summary")
                 
-                if summary_data:
-                    summary_df = pd.DataFrame(summary_data)
-                    st.dataframe(summary_df, use_container_width=True)
-                else:
-                    st.info("Non abbastanza dati per il riepilogo" if language == "Italiano" 
-                           else "Not enough data for summary")
+                    # Prophet forecast for the whole catalog, one fit per SKU across all cores
+                    st.subheader("🔮 Previsione AI Tutti i Prodotti" if language == "Italiano"
+                               else "🔮 AI Forecast for All Products")
+                    catalog_key = (data_hash, forecast_days, forecast_model)
+                    portfolio_results = get_catalog_forecasts().get(catalog_key)
+                    if portfolio_results is None and forecast_model == "hierarchical":
+                        # The reconciled forecast of every SKU is already cached for the summary table
+                        reconciled, hierarchy = get_hierarchical_forecast(data_hash, forecast_days, df)
+                        portfolio_results = list(forecast_results(reconciled, dict.fromkeys(hierarchy['sku'], "hierarchical")))
+                    if portfolio_results is None and st.button("Calcola previsioni per tutto il catalogo" if language == "Italiano"
+                                                               else "Forecast the whole catalog"):
+                        portfolio_results = []
+                        progress = st.progress(0.0)
+                        table = st.empty()
+                        n_skus = df['sku'].nunique()
+                        for result in forecast_portfolio(df, data_hash, forecast_days, lead_time_days,
+                                                         safety_stock_days, cache_dir=model_cache_dir(),
+                                                         model=forecast_model):
+                            portfolio_results.append(result)
+                            rerun_timer.extend(result.get('timings', []), sku=result['sku'])
+                            progress.progress(len(portfolio_results) / n_skus)
+                            table.dataframe(portfolio_table(portfolio_results, language), use_container_width=True)
+                        progress.empty()
+                        table.empty()
+                        get_catalog_forecasts().put(catalog_key, portfolio_results)
+                    
+                    if portfolio_results is not None:
+                        portfolio_results = recommend_portfolio(df, portfolio_results, lead_time_days, safety_stock_days)
+                        st.dataframe(portfolio_table(portfolio_results, language), use_container_width=True)
                 
-            else:
-                st.warning(f"⚠️ Dati insufficienti per {selected_sku}. Servono almeno 10 punti dati per la previsione." if language == "Italiano"
-                          else f"⚠️ Not enough data points for {selected_sku}. Need at least 10 data points for forecasting.")
+                else:
+                    st.warning(f"⚠️ Dati insufficienti per {selected_sku}. Servono almeno 10 punti dati per la previsione." if language == "Italiano"
+                              else f"⚠️ Not enough data points for {selected_sku}. Need at least 10 data points for forecasting.")
             
-    except Exception as e:
-        st.error(f"❌ Errore nella lettura del file: {str(e)}" if language == "Italiano"
-                else f"❌ Error reading file: {str(e)}")
-        st.write("Assicurati che il file Excel abbia il formato corretto e i nomi delle colonne giusti." if language == "Italiano"
-                else "Please make sure your Excel file has the correct format and column names.")
-
-else:
-    st.info("👆 Carica un file Excel per iniziare!" if language == "Italiano" 
-           else "👆 Please upload an Excel file to get started!")
+        except Exception as e:
+            st.error(f"❌ Errore nella lettura del file: {str(e)}" if language == "Italiano"
+                    else f"❌ Error reading file: {str(e)}")
+            st.write("Assicurati che il file Excel abbia il formato corretto e i nomi delle colonne giusti." if language == "Italiano"
+                    else "Please make sure your Excel file has the correct format and column names.")
+
+    else:
+        st.info("👆 Carica un file Excel per iniziare!" if language == "Italiano" 
+               else "👆 Please upload an Excel file to get started!")
     
-    # Show example data format with Small Giants products
-    st.subheader("📋 Formato Dati Atteso" if language == "Italiano" else "📋 Expected Data Format")
-    example_data = {
-        'date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'],
-        'sku': ['CRACKER-ROSMARINO-TIMO', 'CRACKER-ROSMARINO-TIMO', 'PUFFS-LIEVITO', 'PUFFS-LIEVITO'],
-        'units_sold': [15, 12, 25, 30],
-        'on_hand_end': [185, 173, 125, 95]
-    }
-    example_df = pd.DataFrame(example_data)
-    st.dataframe(example_df, use_container_width=True)
+        # Show example data format with Small Giants products
+        st.subheader("📋 Formato Dati Atteso" if language == "Italiano" else "📋 Expected Data Format")
+        example_data = {
+            'date': ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'],
+            'sku': ['CRACKER-ROSMARINO-TIMO', 'CRACKER-ROSMARINO-TIMO', 'PUFFS-LIEVITO', 'PUFFS-LIEVITO'],
+            'units_sold': [15, 12, 25, 30],
+            'on_hand_end': [185, 173, 125, 95]
+        }
+        example_df = pd.DataFrame(example_data)
+        st.dataframe(example_df, use_container_width=True)
     
-    st.write("**Descrizione colonne:**" if language == "Italiano" else "**Column descriptions:**")
-    descriptions = {
-        "Italiano": [
-            "- **date**: Data della vendita",
-            "- **sku**: Codice prodotto Small Giants (es. CRACKER-ROSMARINO-TIMO)",
-            "- **units_sold**: Numero di unità vendute in quella data", 
-            "- **on_hand_end**: Inventario rimanente a fine giornata"
-        ],
-        "English": [
-            "- **date**: Date of the sales record",
-            "- **sku**: Small Giants product code (e.g., CRACKER-ROSMARINO-TIMO)",
-            "- **units_sold**: Number of units sold on that date",
-            "- **on_hand_end**: Inventory remaining at end of day"
-        ]
-    }
+        st.write("**Descrizione colonne:**" if language == "Italiano" else "**Column descriptions:**")
+        descriptions = {
+            "Italiano": [
+                "- **date**: Data della vendita",
+                "- **sku**: Codice prodotto Small Giants (es. CRACKER-ROSMARINO-TIMO)",
+                "- **units_sold**: Numero di unità vendute in quella data", 
+                "- **on_hand_end**: Inventario rimanente a fine giornata"
+            ],
+            "English": [
+                "- **date**: Date of the sales record",
+                "- **sku**: Small Giants product code (e.g., CRACKER-ROSMARINO-TIMO)",
+                "- **units_sold**: Number of units sold on that date",
+                "- **on_hand_end**: Inventory remaining at end of day"
+            ]
+        }
     
-    for desc in descriptions[language]:
-        st.write(desc)
+        for desc in descriptions[language]:
+            st.write(desc)
+
+finally:
+    # Also when the rerun ends in st.stop() or an error: never leave the profiler
+    # attached to the server process, and log every rerun
+    rerun_timer.record('rerun_total', time.time() - rerun_timer.started_at)
+    if os.environ.get("SMALL_GIANTS_METRICS_LOG"):
+        rerun_timer.write_jsonl(os.environ["SMALL_GIANTS_METRICS_LOG"])
+    report = profiler.stop() if profiler is not None else None
+
+if diagnostics:
+    with st.sidebar.expander("⏱️ Tempi per fase", expanded=True):
+        st.dataframe(pd.DataFrame(rerun_timer.records), use_container_width=True)
+        st.download_button("Scarica JSONL", rerun_timer.to_jsonl(), file_name=f"timings-{rerun_timer.run_id}.jsonl")
+    if report is not None:
+        with st.sidebar.expander("🔬 Profilo del rerun"):
+            st.write(f"Picco memoria: {report['peak_bytes'] / 1e6:,.1f} MB" if 'peak_bytes' in report else "tracemalloc già attivo")
+            st.code(report['cpu'])
+            st.code("\n".join(report.get('memory', [])))
 
 # Footer
 st.markdown("---")
@@ -396,3 +650,5 @@ st.markdown("""
     <p><em>Powered by AI Forecasting Technology</em></p>
 </div>
 """, unsafe_allow_html=True)
+
+start_prewarm()
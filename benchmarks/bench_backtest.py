@@ -0,0 +1,69 @@
+"""Rolling-origin accuracy and throughput benchmark on synthetic sales.
+
+    python benchmarks/bench_backtest.py --skus 50 --days 730 --model prophet --workers 8
+    python benchmarks/bench_backtest.py --input sales.parquet --out folds.parquet
+
+Runs fully offline and is reproducible for a given --seed, so accuracy and
+time-per-fit numbers can be compared across commits to catch regressions.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from small_giants.backtest import run_backtest, summarize_backtest  # noqa: E402
+from small_giants.ingestion import load_sales  # noqa: E402
+from small_giants.synthetic import generate_sales  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', help="real sales file instead of synthetic data")
+    parser.add_argument('--skus', type=int, default=50)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', choices=['prophet', 'baseline'], default='prophet')
+    parser.add_argument('--horizon', type=int, default=28)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', help="reuse fold results from a previous run")
+    parser.add_argument('--out', help="write per-fold results (.parquet or .csv)")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'rb') as f:
+            df = load_sales(f.read(), args.input)
+    else:
+        df = generate_sales(args.skus, args.days, seed=args.seed)
+    n_skus = df['sku'].nunique()
+    print(f"{len(df):,} rows, {n_skus:,} SKUs, model={args.model}, {args.folds} folds x {args.horizon} days")
+
+    start = time.perf_counter()
+    folds = run_backtest(df, args.horizon, args.folds, model=args.model, workers=args.workers,
+                         cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
+    summary = summarize_backtest(folds)
+
+    failed = folds['error'].notna().sum()
+    print(f"wall time {elapsed:.1f}s, {len(folds) - failed} folds scored, {failed} SKUs failed, "
+          f"{(len(folds) - failed) / elapsed:.1f} folds/s")
+    print(f"median WAPE {summary['wape'].median():.3f}, median MAPE {summary['mape'].median():.3f}, "
+          f"median bias {summary['bias'].median():+.3f}, mean coverage {summary['coverage'].mean():.3f}")
+    cached = int(folds['cached'].fillna(False).sum()) if 'cached' in folds else 0
+    if cached and cached == len(folds) - failed:
+        print(f"all {cached} folds came from the cache, no fit/predict timings")
+    else:
+        print(f"mean fit {summary['fit_seconds'].mean():.3f}s, mean predict {summary['predict_seconds'].mean():.3f}s per fold"
+              + (f" ({cached} cached folds not timed)" if cached else ""))
+
+    if args.out:
+        if args.out.endswith('.csv'):
+            folds.to_csv(args.out, index=False)
+        else:
+            folds.to_parquet(args.out, index=False)
+
+
+if __name__ == '__main__':
+    main()
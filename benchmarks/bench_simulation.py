@@ -0,0 +1,39 @@
+"""Time the Monte Carlo inventory simulation over a synthetic catalog.
+
+    python benchmarks/bench_simulation.py --skus 3000 --scenarios 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from small_giants.simulation import simulate_inventory  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skus', type=int, default=3000)
+    parser.add_argument('--scenarios', type=int, default=10_000)
+    parser.add_argument('--horizon', type=int, default=90)
+    parser.add_argument('--lead-time-std', type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    yhat = rng.gamma(2.0, 3.0, (args.skus, 1)) * (1 + 0.2 * np.sin(np.arange(args.horizon) * 2 * np.pi / 7))
+    spread = 1.96 * np.sqrt(yhat)
+    on_hand = rng.integers(0, 400, args.skus)
+
+    start = time.perf_counter()
+    result = simulate_inventory(yhat, yhat - spread, yhat + spread, on_hand, 7, 14,
+                                lead_time_std=args.lead_time_std, n_scenarios=args.scenarios)
+    elapsed = time.perf_counter() - start
+    print(f"{args.skus:,} SKUs x {args.scenarios:,} scenarios: {elapsed:.2f}s")
+    print(result['status'].value_counts().to_string())
+
+
+if __name__ == '__main__':
+    main()
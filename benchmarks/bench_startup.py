@@ -0,0 +1,64 @@
+"""Time a cold start of the app: imports, first paint, and the Prophet pre-warm.
+
+    python benchmarks/bench_startup.py --repeat 5
+
+Every measurement runs in a fresh interpreter, so nothing is already imported.
+"Eager imports" is what app.py used to load before the landing page could render.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+TIMED = """
+import time
+start = time.perf_counter()
+{body}
+print(time.perf_counter() - start)
+"""
+
+CASES = {
+    'app imports': """
+import streamlit, pandas, numpy
+from small_giants import (baseline, batch, cache, charts, dataset, forecasting, hierarchy, ingestion,
+                          inventory, jobs, profiling, simulation)
+""",
+    'eager imports (before)': """
+import streamlit, pandas, numpy
+import plotly.express, plotly.graph_objects
+from prophet import Prophet
+""",
+    'first paint (no upload)': """
+from streamlit.testing.v1 import AppTest
+AppTest.from_file('app.py', default_timeout=120).run()
+""",
+    'prewarm': """
+from small_giants.forecasting import prewarm
+prewarm()
+""",
+}
+
+
+def run_case(body):
+    env = dict(os.environ, SMALL_GIANTS_PREWARM='0', PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', TIMED.format(body=body)], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument('--case', choices=list(CASES), action='append', help="only these measurements")
+    args = parser.parse_args()
+
+    for name in args.case or CASES:
+        times = [run_case(CASES[name]) for _ in range(args.repeat)]
+        print(f"{name:<24} median {statistics.median(times):.2f}s  min {min(times):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare the vectorized portfolio summary with the original per-SKU loop.
+
+    python benchmarks/bench_summary.py --skus 2000 --days 730
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from small_giants.inventory import summarize_portfolio  # noqa: E402
+
+
+def make_sales(n_skus, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-01-01', periods=n_days)
+    df = pd.DataFrame({
+        'date': np.tile(dates, n_skus),
+        'sku': np.repeat([f"SKU-{i:05d}" for i in range(n_skus)], n_days),
+        'units_sold': rng.poisson(5, n_skus * n_days),
+        'on_hand_end': rng.integers(0, 500, n_skus * n_days),
+    })
+    # Uploads are not guaranteed to be sorted by date
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def loop_summary(df, safety_stock_days):
+    # The summary loop app.py used before summarize_portfolio()
+    summary_data = []
+    for sku in df['sku'].unique():
+        sku_subset = df[df['sku'] == sku].copy()
+        if len(sku_subset) >= 5:
+            current_stock = sku_subset['on_hand_end'].iloc[-1]
+            avg_daily_sales = sku_subset.groupby('date')['units_sold'].sum().mean()
+            days_stock = current_stock / avg_daily_sales if avg_daily_sales > 0 else float('inf')
+            if days_stock < safety_stock_days:
+                status = 'critical'
+            elif days_stock < safety_stock_days * 2:
+                status = 'warning'
+            else:
+                status = 'good'
+            summary_data.append({'sku': sku, 'current_stock': current_stock,
+                                 'avg_daily_sales': avg_daily_sales,
+                                 'days_of_stock': days_stock, 'status': status})
+    return pd.DataFrame(summary_data)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--skus', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--safety-stock-days', type=int, default=14)
+    parser.add_argument('--skip-loop', action='store_true', help="only time the vectorized summary")
+    args = parser.parse_args()
+
+    df = make_sales(args.skus, args.days)
+    print(f"{len(df):,} rows, {args.skus:,} SKUs")
+
+    summary, vectorized = timed(summarize_portfolio, df, args.safety_stock_days)
+    print(f"vectorized: {vectorized:.3f}s")
+    if args.skip_loop:
+        return
+
+    expected, loop = timed(loop_summary, df, args.safety_stock_days)
+    print(f"loop:       {loop:.3f}s ({loop / vectorized:.0f}x slower)")
+    # The loop takes the last row rather than the last date, so only the means must agree
+    pd.testing.assert_series_equal(summary['avg_daily_sales'], expected['avg_daily_sales'])
+
+
+if __name__ == '__main__':
+    main()
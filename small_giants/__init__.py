@@ -0,0 +1 @@
+"""Small Giants demand forecasting core (no Streamlit dependency)."""
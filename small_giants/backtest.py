@@ -0,0 +1,157 @@
+"""Rolling-origin backtests of the forecasting tiers across the whole catalog.
+
+For each cutoff the model is fit on the history up to the cutoff and scored on
+the following `horizon` days. Prophet folds run on the process pool with the
+app's configuration (`prophet_config`) and are cached on disk per fold. The
+baseline tier scores every SKU of a fold in one vectorized call.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .baseline import baseline_forecast
+from .batch import DEFAULT_SKU_TIMEOUT, run_pool
+from .forecasting import fit_model, prepare_daily_sales, prophet_config
+
+
+def rolling_cutoffs(dates, horizon, n_folds, step=None):
+    """The last `n_folds` cutoff dates, `step` days apart (default: `horizon`), leaving `horizon` days after each."""
+    step = step or horizon
+    last = pd.Timestamp(dates.max())
+    return [last - pd.Timedelta(days=horizon + i * step) for i in reversed(range(n_folds))]
+
+
+def fold_metrics(actual, yhat, lower, upper):
+    actual = np.asarray(actual, dtype=float)
+    error = np.asarray(yhat, dtype=float) - actual
+    positive = actual > 0
+    total = actual.sum()
+    return {
+        'n': len(actual),
+        'actual': total,
+        'abs_error': np.abs(error).sum(),
+        'signed_error': error.sum(),
+        'ape_sum': (np.abs(error[positive]) / actual[positive]).sum(),
+        'ape_n': int(positive.sum()),
+        'covered': int(((actual >= lower) & (actual <= upper)).sum()),
+    }
+
+
+def _fold_key(sku, cutoff, train, test, horizon, config):
+    # The cutoff and test window matter too: a SKU with no rows between two cutoffs has the same train
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([sku, str(cutoff), horizon, config], sort_keys=True).encode())
+    for frame in (train, test):
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def backtest_prophet_sku(sku, daily_sales, cutoffs, horizon, cache_dir=None):
+    folds = []
+    for cutoff in cutoffs:
+        train = daily_sales[daily_sales['ds'] <= cutoff]
+        test = daily_sales[(daily_sales['ds'] > cutoff)
+                           & (daily_sales['ds'] <= cutoff + pd.Timedelta(days=horizon))]
+        if len(train) < 2 or test.empty:
+            continue
+        config = prophet_config(len(train))
+        path = os.path.join(cache_dir, f"{_fold_key(sku, cutoff, train, test, horizon, config)}.json") if cache_dir else None
+        if path and os.path.exists(path):
+            # Timings in the file were measured by the run that wrote it, not this one
+            with open(path) as f:
+                folds.append({**json.load(f), 'cached': True})
+            continue
+
+        start = time.perf_counter()
+        model = fit_model(train, config)
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        forecast = model.predict(test[['ds']])
+        predict_seconds = time.perf_counter() - start
+
+        fold = fold_metrics(test['y'], forecast['yhat'], forecast['yhat_lower'], forecast['yhat_upper'])
+        fold.update(cutoff=str(cutoff.date()), fit_seconds=fit_seconds, predict_seconds=predict_seconds)
+        if path:
+            with open(path, 'w') as f:
+                json.dump(fold, f)
+        folds.append({**fold, 'cached': False})
+    return {'sku': sku, 'folds': folds}
+
+
+def _backtest_prophet(df, cutoffs, horizon, workers, sku_timeout, cache_dir):
+    tasks = ((sku, (prepare_daily_sales(group), cutoffs, horizon, cache_dir))
+             for sku, group in df.groupby('sku', sort=False))
+    rows = []
+    for result in run_pool(backtest_prophet_sku, tasks, workers, sku_timeout):
+        if result['error']:
+            rows.append({'sku': result['sku'], 'error': result['error']})
+        for fold in result.get('folds', []):
+            rows.append({'sku': result['sku'], 'error': None, **fold})
+    return rows
+
+
+def _backtest_baseline(df, cutoffs, horizon):
+    daily = df.groupby(['sku', 'date'], sort=False, observed=True)['units_sold'].sum().reset_index()
+    rows = []
+    for cutoff in cutoffs:
+        train = df[df['date'] <= cutoff]
+        start = time.perf_counter()
+        forecast, selection = baseline_forecast(train, horizon)
+        seconds = (time.perf_counter() - start) / max(len(selection), 1)
+        test = daily[(daily['date'] > cutoff) & (daily['date'] <= cutoff + pd.Timedelta(days=horizon))]
+        scored = test.merge(forecast, left_on=['sku', 'date'], right_on=['sku', 'ds'])
+        for sku, group in scored.groupby('sku', sort=False, observed=True):
+            fold = fold_metrics(group['units_sold'], group['yhat'], group['yhat_lower'], group['yhat_upper'])
+            # One vectorized call fits and predicts every SKU: report its per-SKU share as fit time
+            fold.update(cutoff=str(cutoff.date()), fit_seconds=seconds, predict_seconds=0.0)
+            rows.append({'sku': sku, 'error': None, **fold})
+    return rows
+
+
+def run_backtest(df, horizon=28, n_folds=3, step=None, model='prophet', workers=None,
+                 sku_timeout=DEFAULT_SKU_TIMEOUT, cache_dir=None):
+    """Rolling-origin backtest of every SKU; returns one row per (SKU, fold) with error sums and timings."""
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    cutoffs = rolling_cutoffs(df['date'], horizon, n_folds, step)
+    if model == 'baseline':
+        rows = _backtest_baseline(df, cutoffs, horizon)
+    else:
+        rows = _backtest_prophet(df, cutoffs, horizon, workers, sku_timeout, cache_dir)
+    return pd.DataFrame(rows)
+
+
+def summarize_backtest(folds):
+    """Per-SKU WAPE, MAPE, bias, interval coverage and mean fit/predict seconds across folds.
+
+    Folds served from the fold cache count towards accuracy but not towards
+    the timing means, which are NaN for a SKU whose folds were all cached.
+    """
+    if 'cutoff' not in folds:
+        return pd.DataFrame(columns=['sku', 'folds', 'wape', 'mape', 'bias', 'coverage',
+                                     'fit_seconds', 'predict_seconds'])
+    scored = folds[folds['error'].isna()]
+    if 'cached' in scored:
+        cached = scored['cached'].fillna(False).astype(bool)
+        scored = scored.assign(fit_seconds=scored['fit_seconds'].mask(cached),
+                               predict_seconds=scored['predict_seconds'].mask(cached))
+    sums = scored.groupby('sku', sort=False).agg(
+        folds=('cutoff', 'size'), n=('n', 'sum'), actual=('actual', 'sum'),
+        abs_error=('abs_error', 'sum'), signed_error=('signed_error', 'sum'),
+        ape_sum=('ape_sum', 'sum'), ape_n=('ape_n', 'sum'), covered=('covered', 'sum'),
+        fit_seconds=('fit_seconds', 'mean'), predict_seconds=('predict_seconds', 'mean'),
+    )
+    actual = sums['actual'].where(sums['actual'] > 0)
+    return pd.DataFrame({
+        'folds': sums['folds'],
+        'wape': sums['abs_error'] / actual,
+        'mape': sums['ape_sum'] / sums['ape_n'].where(sums['ape_n'] > 0),
+        'bias': sums['signed_error'] / actual,
+        'coverage': sums['covered'] / sums['n'],
+        'fit_seconds': sums['fit_seconds'],
+        'predict_seconds': sums['predict_seconds'],
+    }).reset_index()
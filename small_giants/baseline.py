@@ -0,0 +1,171 @@
+"""Cheap forecasters computed for every SKU at once on a dense SKU x day matrix.
+
+Each method takes `Y` (n_skus x n_days daily units, NaN before a SKU's first
+record) and returns an n_skus x horizon array of point forecasts.
+"""
+import numpy as np
+import pandas as pd
+
+from .profiling import stage
+
+SEASON = 7
+
+# Tier selection: Prophet is only worth a Stan fit for long, dense histories
+# that the cheap methods don't already forecast well
+MIN_PROPHET_HISTORY = 90
+INTERMITTENT_ZERO_SHARE = 0.5
+BASELINE_WAPE_OK = 0.2
+
+
+def daily_matrix(df):
+    """Dense (skus, dates, Y) with daily unit totals; days without rows after a SKU's first record count as zero."""
+    codes, skus = pd.factorize(df['sku'], sort=False)
+    day = df['date'].to_numpy().astype('datetime64[D]')
+    first_day = day.min()
+    offset = (day - first_day).astype(np.int64)
+    n_days = int(offset.max()) + 1
+
+    Y = np.zeros((len(skus), n_days))
+    # Blank cells count as zero, as in a pandas groupby sum
+    np.add.at(Y, (codes, offset), np.nan_to_num(df['units_sold'].to_numpy(dtype=float)))
+    start = np.full(len(skus), n_days, dtype=np.int64)
+    np.minimum.at(start, codes, offset)
+    Y[np.arange(n_days) < start[:, None]] = np.nan
+
+    dates = pd.date_range(pd.Timestamp(first_day), periods=n_days, freq='D')
+    return np.asarray(skus), dates, Y
+
+
+def seasonal_naive(Y, horizon, season=SEASON):
+    last = np.nan_to_num(Y[:, -season:])
+    return np.tile(last, -(-horizon // season))[:, :horizon]
+
+
+def moving_average(Y, horizon, window=28):
+    with np.errstate(invalid='ignore'):
+        level = np.nan_to_num(np.nanmean(Y[:, -window:], axis=1))
+    return np.repeat(level[:, None], horizon, axis=1)
+
+
+def exponential_smoothing(Y, horizon, alpha=0.2, gamma=0.1, season=SEASON):
+    # Additive Holt-Winters without trend; states advance only on observed days
+    n, T = Y.shape
+    level = np.full(n, np.nan)
+    seasonal = np.zeros((n, season))
+    for t in range(T):
+        y = Y[:, t]
+        k = t % season
+        observed = ~np.isnan(y)
+        first = observed & np.isnan(level)
+        level[first] = y[first]
+        upd = observed & ~first
+        s = seasonal[upd, k]
+        level[upd] = alpha * (y[upd] - s) + (1 - alpha) * level[upd]
+        seasonal[upd, k] = gamma * (y[upd] - level[upd]) + (1 - gamma) * s
+    steps = (T + np.arange(horizon)) % season
+    return np.maximum(np.nan_to_num(level)[:, None] + seasonal[:, steps], 0)
+
+
+def croston_sba(Y, horizon, alpha=0.1):
+    # Croston's method with the Syntetos-Boylan bias correction, for intermittent demand
+    n, T = Y.shape
+    size = np.full(n, np.nan)
+    interval = np.full(n, np.nan)
+    since = np.ones(n)
+    for t in range(T):
+        y = Y[:, t]
+        observed = ~np.isnan(y)
+        demand = observed & (y > 0)
+        first = demand & np.isnan(size)
+        size[first] = y[first]
+        interval[first] = since[first]
+        upd = demand & ~first
+        size[upd] = alpha * y[upd] + (1 - alpha) * size[upd]
+        interval[upd] = alpha * since[upd] + (1 - alpha) * interval[upd]
+        since[demand] = 1
+        since[observed & ~demand] += 1
+    rate = np.nan_to_num((1 - alpha / 2) * size / interval)
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+METHODS = {
+    'seasonal_naive': seasonal_naive,
+    'moving_average': moving_average,
+    'exponential_smoothing': exponential_smoothing,
+    'croston_sba': croston_sba,
+}
+
+
+def backtest_errors(Y, holdout):
+    """Holdout forecast errors (methods x skus x holdout) of every method."""
+    train, actual = Y[:, :-holdout], Y[:, -holdout:]
+    return np.stack([fn(train, holdout) - actual for fn in METHODS.values()])
+
+
+def baseline_forecast(df, horizon, z=1.96):
+    """Forecast every SKU with its best cheap method and pick a tier for each.
+
+    Returns `(forecast, selection)`. `forecast` is a long frame with `sku`,
+    `ds`, `yhat`, `yhat_lower` and `yhat_upper` (the interval comes from the
+    chosen method's holdout RMSE), shaped like Prophet's future rows so it
+    feeds `inventory_recommendation()` unchanged. `selection` has one row per
+    SKU with the chosen method, its holdout WAPE, the history length, the
+    share of zero-sales days and the tier ('baseline' or 'prophet').
+    """
+    with stage('daily_matrix'):
+        skus, dates, Y = daily_matrix(df)
+    n_skus, n_days = Y.shape
+    observed = ~np.isnan(Y)
+    history = observed.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        zero_share = np.where(history > 0, ((Y == 0) & observed).sum(axis=1) / np.maximum(history, 1), 1.0)
+
+    holdout = min(28, max(SEASON, n_days // 5))
+    names = list(METHODS)
+    if n_days > holdout + SEASON:
+        with stage('baseline_backtest', skus=n_skus):
+            errors = backtest_errors(Y, holdout)
+        actual_total = np.nansum(np.abs(Y[:, -holdout:]), axis=1)
+        wape = np.nansum(np.abs(errors), axis=2) / np.maximum(actual_total, 1)
+        # Intermittent SKUs always go to Croston/SBA: WAPE rewards forecasting zero
+        wape[names.index('croston_sba'), zero_share < INTERMITTENT_ZERO_SHARE] = np.inf
+        wape[:names.index('croston_sba'), zero_share >= INTERMITTENT_ZERO_SHARE] = np.inf
+        best = np.argmin(wape, axis=0)
+        best_wape = wape[best, np.arange(n_skus)]
+        with np.errstate(invalid='ignore'):
+            sigma = np.sqrt(np.nanmean(errors[best, np.arange(n_skus)] ** 2, axis=1))
+        sigma = np.nan_to_num(sigma)
+    else:
+        # Too short to backtest: fall back to the moving average with no interval
+        best = np.full(n_skus, names.index('moving_average'))
+        best_wape = np.full(n_skus, np.nan)
+        sigma = np.zeros(n_skus)
+
+    yhat = np.empty((n_skus, horizon))
+    with stage('baseline_predict', skus=n_skus):
+        for i, fn in enumerate(METHODS.values()):
+            rows = best == i
+            if rows.any():
+                yhat[rows] = fn(Y[rows], horizon)
+
+    future = pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    forecast = pd.DataFrame({
+        'sku': np.repeat(skus, horizon),
+        'ds': np.tile(future, n_skus),
+        'yhat': yhat.ravel(),
+        'yhat_lower': np.maximum(yhat - z * sigma[:, None], 0).ravel(),
+        'yhat_upper': (yhat + z * sigma[:, None]).ravel(),
+    })
+
+    prophet = ((history >= MIN_PROPHET_HISTORY)
+               & (zero_share < INTERMITTENT_ZERO_SHARE)
+               & ~(best_wape <= BASELINE_WAPE_OK))
+    selection = pd.DataFrame({
+        'sku': skus,
+        'method': np.asarray(names)[best],
+        'wape': best_wape,
+        'history_days': history,
+        'zero_share': zero_share,
+        'tier': np.where(prophet, 'prophet', 'baseline'),
+    })
+    return forecast, selection
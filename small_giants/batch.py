@@ -0,0 +1,209 @@
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from queue import Empty
+
+from .baseline import baseline_forecast
+from .forecasting import MIN_FORECAST_POINTS, ModelCache, prepare_daily_sales
+from .inventory import inventory_recommendation
+from .profiling import StageTimer
+
+DEFAULT_SKU_TIMEOUT = 300
+
+RESULT_COLUMNS = ['sku', 'model', 'current_inventory', 'period_forecast', 'recommended_order',
+                  'avg_daily', 'days_of_stock', 'total_period', 'error', 'seconds']
+
+# Forecast rows kept in every result, so new reorder parameters never need another fit
+FUTURE_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def forecast_sku(sku, sku_data, data_hash, forecast_days, lead_time_days, safety_stock_days,
+                 cache_dir=None):
+    sku_data = sku_data.sort_values('date')
+    if len(sku_data) < MIN_FORECAST_POINTS:
+        raise ValueError(f"need at least {MIN_FORECAST_POINTS} data points, got {len(sku_data)}")
+    daily_sales = prepare_daily_sales(sku_data)
+    forecast = ModelCache(cache_dir=cache_dir).forecast(data_hash, sku, daily_sales, forecast_days)
+    future_dates = forecast[forecast['ds'] > daily_sales['ds'].max()]
+    rec = inventory_recommendation(daily_sales, future_dates, sku_data['on_hand_end'].iloc[-1],
+                                   lead_time_days, safety_stock_days)
+    rec['sku'] = sku
+    rec['model'] = 'prophet'
+    rec['future'] = future_dates[FUTURE_COLUMNS].reset_index(drop=True)
+    return rec
+
+
+def _baseline_results(df, forecast, skus, lead_time_days, safety_stock_days):
+    groups = df[df['sku'].isin(skus)].groupby('sku', sort=False)
+    future = dict(tuple(forecast[forecast['sku'].isin(skus)].groupby('sku', sort=False)))
+    for sku, sku_data in groups:
+        start = time.perf_counter()
+        sku_data = sku_data.sort_values('date')
+        rec = inventory_recommendation(prepare_daily_sales(sku_data), future[sku],
+                                       sku_data['on_hand_end'].iloc[-1], lead_time_days, safety_stock_days)
+        rec.update(sku=sku, model=skus[sku], error=None, seconds=time.perf_counter() - start,
+                   future=future[sku][FUTURE_COLUMNS].reset_index(drop=True))
+        yield rec
+
+
+def forecast_results(forecast, models):
+    """Results for `recommend_portfolio()` from a long forecast frame (`sku`, `ds`, `yhat`, ...).
+
+    `models` maps each SKU to keep to its model label.
+    """
+    for sku, rows in forecast[forecast['sku'].isin(list(models))].groupby('sku', sort=False):
+        yield {'sku': sku, 'model': models[sku], 'error': None, 'seconds': None,
+               'future': rows[FUTURE_COLUMNS].reset_index(drop=True)}
+
+
+def recommend_portfolio(df, results, lead_time_days, safety_stock_days):
+    """Redo `inventory_recommendation()` for finished `forecast_portfolio()` results.
+
+    Each result's `future` forecast rows are reused, so changing the reorder
+    parameters never refits or re-predicts a model. Failed results are
+    yielded unchanged.
+    """
+    results = list(results)
+    skus = [result['sku'] for result in results if not result['error']]
+    groups = dict(tuple(df[df['sku'].isin(skus)].groupby('sku', sort=False, observed=True)))
+    for result in results:
+        if result['error']:
+            yield result
+            continue
+        sku_data = groups[result['sku']].sort_values('date')
+        rec = inventory_recommendation(prepare_daily_sales(sku_data), result['future'],
+                                       sku_data['on_hand_end'].iloc[-1], lead_time_days, safety_stock_days)
+        yield {**result, **rec}
+
+
+_started = None
+
+
+def _init_worker(started, generation):
+    global _started
+    _started = (started, generation)
+
+
+def _run_sku(fn, sku, *args):
+    # Runs in a worker process: never let one SKU's failure take down the pool
+    if _started is not None:
+        queue, generation = _started
+        queue.put((generation, sku, os.getpid(), time.time()))
+    start = time.perf_counter()
+    timer = StageTimer()
+    try:
+        with timer.activate():
+            result = fn(sku, *args)
+        result['error'] = None
+    except Exception as e:
+        result = {'sku': sku, 'model': 'prophet', 'error': f"{type(e).__name__}: {e}"}
+    result['seconds'] = time.perf_counter() - start
+    result['timings'] = timer.records
+    return result
+
+
+def _drain(queue):
+    while True:
+        try:
+            yield queue.get_nowait()
+        except Empty:
+            return
+
+
+def run_pool(fn, tasks, workers=None, sku_timeout=DEFAULT_SKU_TIMEOUT):
+    """Run `fn(sku, *args)` for every `(sku, args)` in `tasks` on a process pool.
+
+    Results are yielded as they finish. A SKU that raises, or is still running
+    `sku_timeout` seconds after its worker started it, is yielded as a result
+    with `error` set instead of stopping the batch. A timed-out worker is
+    killed, which breaks the pool: SKUs still pending or running on other
+    workers are resubmitted to a fresh one.
+    """
+    workers = workers or os.cpu_count() or 1
+    # spawn instead of fork: the Streamlit server is multi-threaded
+    context = multiprocessing.get_context('spawn')
+    started_queue = context.Queue()
+    remaining = list(tasks)
+    generation = 0
+    while remaining:
+        generation += 1
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                       initializer=_init_worker, initargs=(started_queue, generation))
+        try:
+            pending = {executor.submit(_run_sku, fn, sku, *args): (sku, args) for sku, args in remaining}
+            remaining = []
+            # SKU -> (worker pid, wall-clock start), as reported by the worker itself
+            started = {}
+            while pending:
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sku, _ = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        # The worker process itself died (e.g. out of memory)
+                        yield {'sku': sku, 'model': 'prophet', 'error': f"{type(e).__name__}: {e}", 'seconds': None}
+                for run, sku, pid, at in _drain(started_queue):
+                    if run == generation:
+                        started[sku] = (pid, at)
+                now = time.time()
+                hung = [future for future, (sku, _) in pending.items()
+                        if sku in started and now - started[sku][1] > sku_timeout]
+                if hung:
+                    for future in hung:
+                        sku, _ = pending.pop(future)
+                        _kill(started[sku][0])
+                        yield {'sku': sku, 'model': 'prophet', 'error': f"timed out after {sku_timeout}s", 'seconds': None}
+                    remaining = list(pending.values())
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill(pid):
+    try:
+        os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+    except OSError:
+        pass
+
+
+def forecast_portfolio(df, data_hash, forecast_days, lead_time_days, safety_stock_days,
+                       workers=None, sku_timeout=DEFAULT_SKU_TIMEOUT, cache_dir=None, model='prophet',
+                       **hierarchy_options):
+    """Fit and predict every SKU on a process pool, yielding results as they finish.
+
+    Each result is an `inventory_recommendation()` dict plus `sku`, `model`,
+    `error`, `seconds` and the `future` forecast rows it was computed from;
+    failures and timeouts are isolated by `run_pool()`.
+
+    `model` is 'prophet', 'baseline' (the vectorized tier for every SKU),
+    'auto' (baseline results first, then Prophet only for the SKUs the
+    tier selector routes to it) or 'hierarchical' (Prophet per family,
+    reconciled to SKUs; `hierarchy_options` go to `hierarchical_forecast()`).
+    """
+    if model == 'hierarchical':
+        # hierarchy builds on run_pool, so it can only be imported once this module is loaded
+        from .hierarchy import hierarchical_forecast
+
+        forecast, hierarchy = hierarchical_forecast(df, forecast_days, workers=workers,
+                                                    sku_timeout=sku_timeout, cache_dir=cache_dir,
+                                                    **hierarchy_options)
+        yield from _baseline_results(df, forecast, dict.fromkeys(hierarchy['sku'], 'hierarchical'),
+                                     lead_time_days, safety_stock_days)
+        return
+    if model != 'prophet':
+        forecast, selection = baseline_forecast(df, forecast_days)
+        if model == 'auto':
+            selection = selection[selection['tier'] == 'baseline']
+        yield from _baseline_results(df, forecast, dict(zip(selection['sku'], selection['method'])),
+                                     lead_time_days, safety_stock_days)
+        df = df[~df['sku'].isin(selection['sku'])]
+        if df.empty:
+            return
+
+    columns = ['date', 'units_sold', 'on_hand_end']
+    tasks = ((sku, (group[columns], data_hash, forecast_days, lead_time_days, safety_stock_days, cache_dir))
+             for sku, group in df.groupby('sku', sort=False))
+    yield from run_pool(forecast_sku, tasks, workers, sku_timeout)
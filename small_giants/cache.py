@@ -0,0 +1,58 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-memory cache that evicts the least recently used entry."""
+
+    def __init__(self, max_entries=8):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def evict_oldest(directory, suffix, max_entries):
+    """Delete the least recently touched `*suffix` files beyond `max_entries`."""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.endswith(suffix)]
+    if len(paths) <= max_entries:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - max_entries]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,60 @@
+"""Server-side downsampling for the history and forecast charts.
+
+Long daily series are reduced with Largest-Triangle-Three-Buckets (LTTB),
+which keeps the visual shape, plus each series' minimum and maximum so
+demand peaks and stockout dips always survive. Traces that still carry many
+points are rendered with WebGL.
+"""
+import numpy as np
+
+from .profiling import stage
+
+# Per-trace point budget: bounds the serialized figure whatever the history length
+MAX_POINTS = 1500
+WEBGL_THRESHOLD = 1000
+# Above this many points markers are just noise on top of the line
+MARKER_THRESHOLD = 365
+
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points LTTB keeps from `x`, `y` (float arrays, `x` increasing)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the first and last point, which are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(x, y, max_points=MAX_POINTS):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if len(x) <= max_points:
+        return x, y
+    with stage('downsample', points=len(x)):
+        x_num = x.astype('datetime64[ns]').astype(np.int64).astype(float) if np.issubdtype(x.dtype, np.datetime64) \
+            else x.astype(float)
+        keep = np.union1d(lttb(x_num, y, max_points - 2), [np.argmin(y), np.argmax(y)])
+    return x[keep], y[keep]
+
+
+def line_trace(x, y, max_points=MAX_POINTS, **kwargs):
+    """A Scatter trace of the downsampled series, switching to WebGL for large point counts."""
+    import plotly.graph_objects as go
+
+    x, y = downsample(x, y, max_points)
+    trace = go.Scattergl if len(x) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, **kwargs)
@@ -0,0 +1,141 @@
+"""Headless batch forecast: the same pipeline as the Streamlit app, without a browser.
+
+    python -m small_giants --input sales.parquet --out recs.parquet --workers 8
+
+With `--store DIR` the input is a delta (e.g. yesterday's sales) merged into a
+stored history, and only the SKUs it changes are refit.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+from .batch import DEFAULT_SKU_TIMEOUT, RESULT_COLUMNS, forecast_portfolio
+from .ingestion import DateFormatError, content_hash, load_sales, missing_columns
+from .incremental import HistoryStore, run_incremental
+from .inventory import summarize_portfolio
+from .profiling import StageTimer
+
+logger = logging.getLogger('small_giants')
+
+
+def write_table(df, path):
+    if os.path.splitext(path)[1].lower() == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_parquet(path, index=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m small_giants', description=__doc__.splitlines()[0])
+    parser.add_argument('--input', required=True, help="sales file (.csv, .parquet, .xlsx or .xls)")
+    parser.add_argument('--out', required=True, help="recommendations output (.parquet or .csv)")
+    parser.add_argument('--summary', help="optional historical summary output (.parquet or .csv)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--model', choices=['auto', 'prophet', 'baseline', 'hierarchical'], default=None,
+                        help="forecast tier (default: auto; --store always uses prophet)")
+    parser.add_argument('--family-depth', type=int, default=1,
+                        help="hierarchical: dash-separated SKU tokens that name the family (default: 1)")
+    parser.add_argument('--family-prefix', action='append', default=[],
+                        help="hierarchical: a multi-token family such as PASTA-GRILLO (repeatable)")
+    parser.add_argument('--reconcile', choices=['mint', 'top_down'], default='mint',
+                        help="hierarchical: reconciliation of family forecasts to SKUs (default: mint)")
+    parser.add_argument('--store', help="history store directory: treat --input as a delta to append/upsert")
+    parser.add_argument('--forecast-days', type=int, default=90)
+    parser.add_argument('--lead-time-days', type=int, default=7)
+    parser.add_argument('--safety-stock-days', type=int, default=14)
+    parser.add_argument('--sku-timeout', type=float, default=DEFAULT_SKU_TIMEOUT,
+                        help="seconds before a single SKU's fit is reported as failed")
+    parser.add_argument('--cache-dir', default=os.environ.get('SMALL_GIANTS_CACHE_DIR'),
+                        help="directory for fitted models, shared with the app")
+    parser.add_argument('--metrics', help="append per-stage timings as JSON lines to this file")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.store and args.model not in (None, 'prophet'):
+        parser.error("--store only supports --model prophet (warm-started refits)")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    timer = StageTimer(source='cli').install()
+    try:
+        return run(args, timer)
+    finally:
+        if args.metrics:
+            timer.write_jsonl(args.metrics)
+            logger.info("wrote %d stage timings to %s", len(timer.records), args.metrics)
+
+
+def run(args, timer):
+    with open(args.input, 'rb') as f:
+        data = f.read()
+    try:
+        df = load_sales(data, args.input)
+    except DateFormatError as e:
+        logger.error("date format error in %s: %s", args.input, e)
+        return 2
+    missing = missing_columns(df)
+    if missing:
+        logger.error("missing required columns in %s: %s", args.input, missing)
+        return 2
+    logger.info("loaded %d rows, %d SKUs from %s", len(df), df['sku'].nunique(), args.input)
+
+    if args.store:
+        return run_store(args, df)
+
+    if args.summary:
+        write_table(summarize_portfolio(df, args.safety_stock_days), args.summary)
+        logger.info("wrote summary to %s", args.summary)
+
+    model_dir = os.path.join(args.cache_dir, 'models') if args.cache_dir else None
+    start = time.perf_counter()
+    results = []
+    for result in forecast_portfolio(df, content_hash(data), args.forecast_days, args.lead_time_days,
+                                     args.safety_stock_days, workers=args.workers,
+                                     sku_timeout=args.sku_timeout, cache_dir=model_dir,
+                                     model=args.model or 'auto', **hierarchy_options(args)):
+        results.append(result)
+        timer.extend(result.get('timings', []), sku=result['sku'])
+        if result['error']:
+            logger.warning("%s failed: %s", result['sku'], result['error'])
+
+    recs = pd.DataFrame(results).reindex(columns=RESULT_COLUMNS).sort_values('sku')
+    return write_recommendations(recs, args.out, start)
+
+
+def hierarchy_options(args):
+    if args.model != 'hierarchical':
+        return {}
+    return {'depth': args.family_depth, 'prefixes': args.family_prefix, 'method': args.reconcile}
+
+
+def run_store(args, delta):
+    start = time.perf_counter()
+    store = HistoryStore(args.store)
+    recs, changed = run_incremental(store, delta, args.forecast_days, args.lead_time_days,
+                                    args.safety_stock_days, workers=args.workers,
+                                    sku_timeout=args.sku_timeout)
+    logger.info("delta changed %d of %d stored SKUs", len(changed), len(recs))
+    for row in recs[recs['error'].notna()].itertuples():
+        logger.warning("%s failed: %s", row.sku, row.error)
+    if args.summary:
+        write_table(summarize_portfolio(store.read(), args.safety_stock_days), args.summary)
+        logger.info("wrote summary to %s", args.summary)
+    return write_recommendations(recs, args.out, start)
+
+
+def write_recommendations(recs, path, start):
+    write_table(recs, path)
+    failed = recs['error'].notna().sum()
+    logger.info("wrote %d recommendations (%d failed) to %s in %.1fs",
+                len(recs), failed, path, time.perf_counter() - start)
+    return 1 if len(recs) and failed == len(recs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+class CompactSales:
+    """Read-only columnar sales data sorted by (SKU, date), for sharing across sessions.
+
+    SKUs are int32 codes into the sorted `skus` names, dates are int32 day
+    offsets from `start`, and the rows of SKU `i` are
+    `bounds[i]:bounds[i + 1]`, so per-SKU access slices views instead of
+    filtering copies. Units and stock are int32 when the data allows it.
+    `save()` writes an Arrow IPC file that `open()` memory-maps, so several
+    processes on the same upload share one copy through the page cache.
+    """
+
+    def __init__(self, skus, start, codes, day, units, stock):
+        self.skus = skus
+        self.start = start
+        self.codes = codes
+        self.day = day
+        self.units = units
+        self.stock = stock
+        self.bounds = np.searchsorted(codes, np.arange(len(skus) + 1))
+        for array in (codes, day, units, stock):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_frame(cls, df):
+        codes, skus = pd.factorize(df['sku'].astype(str), sort=True)
+        day = df['date'].to_numpy().astype('datetime64[D]')
+        start = day.min()
+        offset = (day - start).astype(np.int32)
+        order = np.lexsort((offset, codes))
+        return cls(np.asarray(skus, dtype=object), start, codes[order].astype(np.int32), offset[order],
+                   df['units_sold'].to_numpy()[order], df['on_hand_end'].to_numpy()[order])
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.codes, self.day, self.units, self.stock))
+
+    def sku_slice(self, sku):
+        i = np.searchsorted(self.skus, sku)
+        if i == len(self.skus) or self.skus[i] != sku:
+            raise KeyError(sku)
+        return slice(self.bounds[i], self.bounds[i + 1])
+
+    def sku_frame(self, sku):
+        """Rows of one SKU sorted by date; `units_sold`/`on_hand_end` are views, not copies."""
+        rows = self.sku_slice(sku)
+        return pd.DataFrame({
+            'date': (self.start + self.day[rows]).astype('datetime64[ns]'),
+            'units_sold': self.units[rows],
+            'on_hand_end': self.stock[rows],
+        }, copy=False)
+
+    def daily_sales(self, sku):
+        # Rows are sorted by day, so same-day entries are adjacent and can be summed with reduceat
+        rows = self.sku_slice(sku)
+        day, units = self.day[rows], self.units[rows]
+        if not len(day):
+            return pd.DataFrame({'ds': pd.Series(dtype='datetime64[ns]'), 'y': pd.Series(dtype=float)})
+        first = np.flatnonzero(np.diff(day, prepend=day[0] - 1))
+        return pd.DataFrame({
+            'ds': (self.start + day[first]).astype('datetime64[ns]'),
+            # Blank cells count as zero, as in forecasting.prepare_daily_sales
+            'y': np.add.reduceat(np.nan_to_num(units), first),
+        })
+
+    def save(self, path):
+        import pyarrow as pa
+
+        table = pa.table({'sku_code': self.codes, 'day': self.day,
+                          'units_sold': self.units, 'on_hand_end': self.stock})
+        table = table.replace_schema_metadata({
+            'skus': json.dumps(list(self.skus)),
+            'start': str(self.start),
+        })
+        # A unique temp file: several server processes may save the same new upload at once
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table, max_chunksize=max(len(self), 1))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def open(cls, path):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        metadata = table.schema.metadata
+        columns = [table.column(name).chunk(0).to_numpy(zero_copy_only=True)
+                   if table.column(name).num_chunks == 1 else table.column(name).to_numpy()
+                   for name in ('sku_code', 'day', 'units_sold', 'on_hand_end')]
+        return cls(np.asarray(json.loads(metadata[b'skus']), dtype=object),
+                   np.datetime64(metadata[b'start'].decode(), 'D'), *columns)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache, evict_oldest
+from .profiling import stage, stan_iterations
+
+# Need at least 10 data points for Prophet
+MIN_FORECAST_POINTS = 10
+
+
+def prophet_config(n_points):
+    return {
+        'daily_seasonality': False,
+        'weekly_seasonality': True,
+        'yearly_seasonality': n_points > 365,
+        'interval_width': 0.95,
+    }
+
+
+def prepare_daily_sales(sku_data):
+    # Aggregate daily sales (in case there are multiple entries per day)
+    daily_sales = sku_data.groupby('date')['units_sold'].sum().reset_index()
+    daily_sales.columns = ['ds', 'y']  # Prophet requires these column names
+    return daily_sales
+
+
+def warm_start_params(model):
+    # Prophet's documented warm start: the previous fit's parameters as Stan's init
+    params = {name: model.params[name][0][0] for name in ['k', 'm', 'sigma_obs']}
+    params.update({name: model.params[name][0] for name in ['delta', 'beta']})
+    return params
+
+
+def fit_model(daily_sales, config=None, warm_start=None):
+    """Fit Prophet, optionally initialized from `warm_start`, a previous fit of the same SKU.
+
+    The warm start is only used when it has the same seasonalities and number
+    of changepoints; otherwise the parameter shapes differ and the fit is cold.
+    """
+    # Imported here: Prophet and cmdstanpy take longer to load than the rest of the app
+    from prophet import Prophet
+
+    config = config or prophet_config(len(daily_sales))
+    model = Prophet(**config)
+    warm = (warm_start is not None
+            and all(getattr(warm_start, name) == value for name, value in config.items())
+            and len(warm_start.changepoints) == model.n_changepoints)
+    with stage('fit', points=len(daily_sales), warm_start=warm) as labels:
+        if warm:
+            model.fit(daily_sales, init=warm_start_params(warm_start))
+        else:
+            model.fit(daily_sales)
+        if labels is not None:
+            labels['stan_iterations'] = stan_iterations(model)
+    return model
+
+
+def predict(model, periods):
+    with stage('predict', periods=periods):
+        future = model.make_future_dataframe(periods=periods)
+        return model.predict(future)
+
+
+def prewarm(progress=None):
+    """Import Prophet and run one tiny fit, so the first real forecast skips loading cmdstan."""
+    with stage('prewarm'):
+        days = pd.date_range('2024-01-01', periods=4 * 7)
+        daily_sales = pd.DataFrame({'ds': days, 'y': np.arange(len(days)) % 7 + 1.0})
+        fit_model(daily_sales)
+
+
+def model_key(data_hash, sku, config):
+    payload = json.dumps([data_hash, sku, config], sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ModelCache:
+    """Fitted Prophet models keyed by (data hash, SKU, model config).
+
+    Models are kept in an in-memory LRU and, when `cache_dir` is set,
+    serialized to JSON there so they survive process restarts. Forecasts are
+    cached per (model, horizon), so changing only the reorder parameters never
+    touches Prophet and changing the horizon only reruns `predict`.
+    """
+
+    def __init__(self, max_models=32, max_forecasts=64, cache_dir=None, max_disk_entries=256):
+        self._models = LRUCache(max_models)
+        self._forecasts = LRUCache(max_forecasts)
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_model(self, data_hash, sku, daily_sales, config=None):
+        config = config or prophet_config(len(daily_sales))
+        key = model_key(data_hash, sku, config)
+        model = self._models.get(key)
+        if model is None:
+            with stage('load_model', sku=sku):
+                model = self._read_disk(key)
+            if model is None:
+                model = fit_model(daily_sales, config)
+                self._write_disk(key, model)
+            self._models.put(key, model)
+        return key, model
+
+    def forecast(self, data_hash, sku, daily_sales, periods, config=None):
+        key, model = self.get_model(data_hash, sku, daily_sales, config)
+        forecast = self._forecasts.get((key, periods))
+        if forecast is None:
+            forecast = predict(model, periods)
+            self._forecasts.put((key, periods), forecast)
+        return forecast
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        from prophet.serialize import model_from_json
+
+        try:
+            with open(path) as f:
+                model = model_from_json(f.read())
+        except Exception:
+            # Corrupt or written by an incompatible Prophet version: refit
+            return None
+        os.utime(path)
+        return model
+
+    def _write_disk(self, key, model):
+        if not self.cache_dir:
+            return
+        from prophet.serialize import model_to_json
+
+        try:
+            with open(self._disk_path(key), 'w') as f:
+                f.write(model_to_json(model))
+        except OSError:
+            return
+        evict_oldest(self.cache_dir, '.json', self.max_disk_entries)
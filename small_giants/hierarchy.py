@@ -0,0 +1,151 @@
+"""Hierarchical forecasts: Prophet per product family, reconciled down to SKUs.
+
+SKU codes follow a family-prefix scheme (`CRACKER-ROSMARINO-TIMO`,
+`PASTA-GRILLO-FUSILLI`, ...). Prophet is fitted once per family and once for
+the total, so the number of Stan fits grows with families rather than SKUs;
+SKU-level base forecasts come from the vectorized baseline tier.
+"""
+import numpy as np
+import pandas as pd
+
+from .baseline import baseline_forecast, daily_matrix
+from .batch import DEFAULT_SKU_TIMEOUT, run_pool
+from .forecasting import MIN_FORECAST_POINTS, ModelCache
+from .ingestion import content_hash
+from .profiling import extend, stage
+
+TOTAL = 'total'
+
+# Recent window the top-down SKU shares are averaged over
+SHARE_WINDOW = 56
+
+
+def sku_families(skus, depth=1, prefixes=()):
+    """Family of each SKU: the longest matching entry of `prefixes`, else its first `depth` dash-separated tokens."""
+    prefixes = sorted(prefixes, key=len, reverse=True)
+    families = []
+    for sku in map(str, skus):
+        family = next((p for p in prefixes if sku == p or sku.startswith(p + '-')), None)
+        families.append(family or '-'.join(sku.split('-')[:depth]))
+    return np.asarray(families)
+
+
+def series_hash(daily_sales):
+    # A family's series depends on which SKUs the prefixes put in it, not just on the upload
+    return content_hash(pd.util.hash_pandas_object(daily_sales, index=False).to_numpy().tobytes())
+
+
+def forecast_node(node, daily_sales, periods, cache_dir=None):
+    # Runs in a worker process, like batch.forecast_sku, for one family or the total
+    if len(daily_sales) < MIN_FORECAST_POINTS:
+        raise ValueError(f"need at least {MIN_FORECAST_POINTS} data points, got {len(daily_sales)}")
+    forecast = ModelCache(cache_dir=cache_dir).forecast(series_hash(daily_sales), node, daily_sales, periods)
+    n_history = len(daily_sales)
+    residuals = daily_sales['y'].to_numpy() - forecast['yhat'].to_numpy()[:n_history]
+    return {
+        'sku': node,
+        'model': 'prophet',
+        'yhat': np.maximum(forecast['yhat'].to_numpy()[n_history:], 0),
+        'variance': float(np.mean(residuals ** 2)),
+    }
+
+
+def mint_reconcile(base, variance, aggregate):
+    """MinT reconciliation with a diagonal (WLS) error covariance.
+
+    `base` stacks the aggregate rows on top of the SKU rows (nodes x horizon),
+    `variance` is each node's in-sample error variance and `aggregate` the
+    0/1 (aggregates x SKUs) summing matrix. Solving through the constraint
+    matrix C = [I, -aggregate] only inverts an aggregates x aggregates system.
+    """
+    C = np.hstack([np.eye(len(aggregate)), -aggregate])
+    W = np.maximum(variance, 1e-9)
+    incoherence = C @ base
+    return base - (W[:, None] * C.T) @ np.linalg.solve((C * W) @ C.T, incoherence)
+
+
+def hierarchical_forecast(df, horizon, depth=1, prefixes=(), method='mint', z=1.96,
+                          workers=None, sku_timeout=DEFAULT_SKU_TIMEOUT, cache_dir=None):
+    """Coherent SKU forecasts from family- and total-level Prophet fits.
+
+    `method` is 'mint' (MinT-WLS combination of the Prophet aggregates with
+    the SKUs' baseline forecasts) or 'top_down' (each family forecast split by
+    the SKUs' share of the family's last `SHARE_WINDOW` days of sales).
+    Families whose fit fails or is too short fall back to the sum of their
+    SKUs' baseline forecasts.
+
+    Returns `(forecast, hierarchy)` shaped like `baseline_forecast()`:
+    `forecast` has `sku`, `ds`, `yhat`, `yhat_lower` and `yhat_upper` (the
+    interval keeps each SKU's baseline holdout RMSE), and `hierarchy` has one
+    row per SKU with its `family`, baseline `method`, top-down `share` and
+    whether its family's Prophet fit was used (`family_fit`).
+    """
+    base, selection = baseline_forecast(df, horizon, z)
+    skus, dates, Y = daily_matrix(df)
+    base_yhat = base['yhat'].to_numpy().reshape(len(skus), horizon)
+    sigma = (base['yhat_upper'].to_numpy().reshape(len(skus), horizon)[:, 0] - base_yhat[:, 0]) / z
+
+    families = sku_families(skus, depth, prefixes)
+    family_names, family_codes = np.unique(families, return_inverse=True)
+    aggregate = np.zeros((len(family_names) + 1, len(skus)))
+    aggregate[0] = 1
+    aggregate[family_codes + 1, np.arange(len(skus))] = 1
+    nodes = [TOTAL] + [f'family:{name}' for name in family_names]
+
+    # Node series start at their first SKU's first record; later gaps count as zero
+    started = ~np.isnan(Y)
+    totals = aggregate @ np.nan_to_num(Y)
+    first = np.argmax(aggregate @ started > 0, axis=1)
+    # Top-down never uses the total, so it is only fitted for MinT
+    tasks = []
+    for i, node in enumerate(nodes):
+        if method == 'mint' or node != TOTAL:
+            series = pd.DataFrame({'ds': dates[first[i]:], 'y': totals[i, first[i]:]})
+            tasks.append((node, (series, horizon, cache_dir)))
+
+    # Bottom-up sums are the fallback for aggregates without a Prophet forecast
+    agg_yhat = aggregate @ base_yhat
+    agg_variance = aggregate @ sigma ** 2
+    fitted = np.zeros(len(nodes), dtype=bool)
+    with stage('hierarchy_fit', nodes=len(tasks)):
+        for result in run_pool(forecast_node, tasks, workers, sku_timeout):
+            extend(result.get('timings', []), sku=result['sku'])
+            if result['error']:
+                continue
+            i = nodes.index(result['sku'])
+            agg_yhat[i], agg_variance[i] = result['yhat'], result['variance']
+            fitted[i] = True
+
+    window = np.nan_to_num(Y[:, -SHARE_WINDOW:]).sum(axis=1)
+    family_window = np.bincount(family_codes, weights=window, minlength=len(family_names))
+    family_size = np.bincount(family_codes, minlength=len(family_names))
+    share = np.where(family_window[family_codes] > 0, window / np.maximum(family_window[family_codes], 1e-9),
+                     1 / family_size[family_codes])
+
+    with stage('reconcile', method=method, skus=len(skus)):
+        if method == 'mint':
+            stacked = np.vstack([agg_yhat, base_yhat])
+            variance = np.concatenate([agg_variance, sigma ** 2])
+            yhat = mint_reconcile(stacked, variance, aggregate)[len(nodes):]
+        elif method == 'top_down':
+            yhat = agg_yhat[family_codes + 1] * share[:, None]
+        else:
+            raise ValueError(f"unknown reconciliation method {method!r}")
+        # MinT can push sparse SKUs slightly negative; clipping trades a little coherence for sane orders
+        yhat = np.maximum(yhat, 0)
+
+    forecast = pd.DataFrame({
+        'sku': base['sku'].to_numpy(),
+        'ds': base['ds'].to_numpy(),
+        'yhat': yhat.ravel(),
+        'yhat_lower': np.maximum(yhat - z * sigma[:, None], 0).ravel(),
+        'yhat_upper': (yhat + z * sigma[:, None]).ravel(),
+    })
+    hierarchy = pd.DataFrame({
+        'sku': skus,
+        'family': families,
+        'method': selection['method'].to_numpy(),
+        'share': share,
+        'family_fit': fitted[family_codes + 1],
+    })
+    return forecast, hierarchy
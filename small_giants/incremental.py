@@ -0,0 +1,182 @@
+"""Stored sales history that grows by daily deltas, refitting only the SKUs that changed."""
+import json
+import os
+import tempfile
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from .batch import DEFAULT_SKU_TIMEOUT, RESULT_COLUMNS, run_pool
+from .forecasting import MIN_FORECAST_POINTS, fit_model, predict, prepare_daily_sales
+from .inventory import inventory_recommendation
+from .profiling import extend
+
+
+def _replace(path, write):
+    # Write next to the target and rename, so a crash never leaves a half-written file; the temp
+    # name is unique so overlapping runs on one store never write into each other's file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class HistoryStore:
+    """Sales history partitioned by SKU, plus the latest fitted model and recommendations.
+
+    Layout under `root`::
+
+        sales/sku=<SKU>/part.parquet   rows of one SKU, sorted by date
+        models/<SKU>.json              last Prophet fit, the warm start for the next one
+        recommendations.parquet        last recommendation per SKU
+        state.json                     parameters those recommendations were made with
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'sales'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'models'), exist_ok=True)
+
+    def _sales_path(self, sku):
+        return os.path.join(self.root, 'sales', f"sku={urllib.parse.quote(sku, safe='')}", 'part.parquet')
+
+    def _model_path(self, sku):
+        return os.path.join(self.root, 'models', f"{urllib.parse.quote(sku, safe='')}.json")
+
+    def skus(self):
+        return [urllib.parse.unquote(name[len('sku='):])
+                for name in sorted(os.listdir(os.path.join(self.root, 'sales')))
+                if name.startswith('sku=')]
+
+    def read_sku(self, sku):
+        path = self._sales_path(sku)
+        return pd.read_parquet(path).astype({'sku': str}) if os.path.exists(path) else None
+
+    def read(self):
+        parts = [self.read_sku(sku) for sku in self.skus()]
+        return pd.concat(parts, ignore_index=True) if parts else None
+
+    def upsert(self, delta):
+        """Merge normalized `delta` rows into the store and return the SKUs whose history changed.
+
+        Rows for a (sku, date) in the delta replace every stored row for that
+        (sku, date); other dates are appended. Only touched partitions are rewritten.
+        """
+        changed = []
+        delta = delta.astype({'sku': str})
+        for sku, rows in delta.groupby('sku', sort=False):
+            old = self.read_sku(sku)
+            merged = rows if old is None else pd.concat([old[~old['date'].isin(rows['date'])], rows])
+            merged = merged.sort_values('date', kind='stable').reset_index(drop=True)
+            if old is not None and merged.equals(old):
+                continue
+            path = self._sales_path(sku)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _replace(path, lambda tmp: merged.to_parquet(tmp, index=False))
+            changed.append(sku)
+        return changed
+
+    def load_model(self, sku):
+        path = self._model_path(sku)
+        if not os.path.exists(path):
+            return None
+        from prophet.serialize import model_from_json
+
+        with open(path) as f:
+            return model_from_json(f.read())
+
+    def save_model(self, sku, model):
+        from prophet.serialize import model_to_json
+
+        payload = model_to_json(model)
+
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                f.write(payload)
+        _replace(self._model_path(sku), write)
+
+    def load_recommendations(self):
+        path = os.path.join(self.root, 'recommendations.parquet')
+        state_path = os.path.join(self.root, 'state.json')
+        if not (os.path.exists(path) and os.path.exists(state_path)):
+            return None, None
+        with open(state_path) as f:
+            return pd.read_parquet(path), json.load(f)['params']
+
+    def save_recommendations(self, recs, params):
+        _replace(os.path.join(self.root, 'recommendations.parquet'),
+                 lambda tmp: recs.to_parquet(tmp, index=False))
+
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump({'params': params}, f)
+        _replace(os.path.join(self.root, 'state.json'), write)
+
+
+def _fitted_on(model, daily_sales):
+    # The stored model is stale if its last refit failed after the partition changed
+    history = model.history
+    return (len(history) == len(daily_sales)
+            and (history['ds'].to_numpy() == daily_sales['ds'].to_numpy()).all()
+            and np.allclose(history['y'].to_numpy(), daily_sales['y'].to_numpy()))
+
+
+def refit_sku(sku, root, refit, forecast_days, lead_time_days, safety_stock_days):
+    store = HistoryStore(root)
+    sku_data = store.read_sku(sku)
+    if len(sku_data) < MIN_FORECAST_POINTS:
+        raise ValueError(f"need at least {MIN_FORECAST_POINTS} data points, got {len(sku_data)}")
+    daily_sales = prepare_daily_sales(sku_data)
+    model = store.load_model(sku)
+    if refit or model is None or not _fitted_on(model, daily_sales):
+        model = fit_model(daily_sales, warm_start=model)
+        store.save_model(sku, model)
+    forecast = predict(model, forecast_days)
+    future_dates = forecast[forecast['ds'] > daily_sales['ds'].max()]
+    rec = inventory_recommendation(daily_sales, future_dates, sku_data['on_hand_end'].iloc[-1],
+                                   lead_time_days, safety_stock_days)
+    rec['sku'] = sku
+    rec['model'] = 'prophet'
+    return rec
+
+
+def run_incremental(store, delta, forecast_days, lead_time_days, safety_stock_days,
+                    workers=None, sku_timeout=DEFAULT_SKU_TIMEOUT):
+    """Apply `delta` (may be None) to `store` and bring its recommendations up to date.
+
+    SKUs whose history changed are refit, warm-started from their previous
+    model. Other SKUs keep their stored recommendation, or are re-predicted
+    from their stored model (no fit) when the reorder parameters changed or
+    their last run failed; a stored model that no longer matches the SKU's
+    history (a refit that failed) is refit instead. Returns
+    `(recommendations, changed_skus)`.
+    """
+    changed = store.upsert(delta) if delta is not None else []
+    params = [forecast_days, lead_time_days, safety_stock_days]
+    previous, previous_params = store.load_recommendations()
+
+    if previous is None or previous_params != params:
+        keep = pd.DataFrame(columns=RESULT_COLUMNS)
+    else:
+        keep = previous[~previous['sku'].isin(changed) & previous['error'].isna()]
+    done = set(changed) | set(keep['sku'])
+    stale = [sku for sku in store.skus() if sku not in done]
+
+    tasks = [(sku, (store.root, True, forecast_days, lead_time_days, safety_stock_days)) for sku in changed]
+    tasks += [(sku, (store.root, False, forecast_days, lead_time_days, safety_stock_days)) for sku in stale]
+    results = []
+    for result in run_pool(refit_sku, tasks, workers, sku_timeout):
+        extend(result.get('timings', []), sku=result['sku'])
+        results.append(result)
+    results = pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+    frames = [df for df in (keep, results) if len(df)]
+    recs = pd.concat(frames) if frames else pd.DataFrame(columns=RESULT_COLUMNS)
+    recs = recs.reindex(columns=RESULT_COLUMNS).sort_values('sku').reset_index(drop=True)
+    store.save_recommendations(recs, params)
+    return recs, changed
@@ -0,0 +1,122 @@
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import LRUCache, evict_oldest
+from .profiling import stage
+
+REQUIRED_COLUMNS = ['date', 'sku', 'units_sold', 'on_hand_end']
+
+
+class DateFormatError(ValueError):
+    """The `date` column could not be parsed as dates."""
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def read_sales_file(data, filename=""):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(io.BytesIO(data))
+    if ext in ('.parquet', '.pq'):
+        return pd.read_parquet(io.BytesIO(data))
+    return pd.read_excel(io.BytesIO(data))
+
+
+def missing_columns(df):
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def load_sales(data, filename=""):
+    with stage('read_file', format=os.path.splitext(filename)[1].lower()):
+        df = read_sales_file(data, filename)
+    with stage('normalize'):
+        return normalize_sales(df)
+
+
+def compact_numeric(values):
+    """Downcast to int32 when every value is a whole number that fits, otherwise keep as is."""
+    values = pd.to_numeric(values)
+    if values.isna().any():
+        return values
+    as_int = values.to_numpy()
+    if not np.array_equal(as_int, np.round(as_int)):
+        return values
+    if len(values) and (as_int.min() < np.iinfo(np.int32).min or as_int.max() > np.iinfo(np.int32).max):
+        return values
+    return values.astype(np.int32)
+
+
+def normalize_sales(df):
+    # Only coerce the columns that are present: missing columns are reported by the caller
+    if 'date' in df.columns:
+        try:
+            with stage('parse_dates'):
+                df['date'] = pd.to_datetime(df['date'])
+        except Exception as e:
+            raise DateFormatError(str(e)) from e
+    if 'sku' in df.columns:
+        df['sku'] = df['sku'].astype(str).astype('category')
+    for col in ('units_sold', 'on_hand_end'):
+        if col in df.columns:
+            df[col] = compact_numeric(df[col])
+    return df
+
+
+class SalesCache:
+    """Parsed and normalized sales frames keyed by a hash of the uploaded bytes.
+
+    Frames live in a bounded in-memory LRU. When `cache_dir` is set, a Parquet
+    copy is also written there so a restarted process skips Excel parsing too;
+    the directory is trimmed to `max_disk_entries` least recently used files.
+    Returned frames are shared between reruns and must not be mutated.
+    """
+
+    def __init__(self, max_entries=8, cache_dir=None, max_disk_entries=32):
+        self._memory = LRUCache(max_entries)
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def load(self, data, filename=""):
+        key = content_hash(data)
+        df = self._memory.get(key)
+        if df is None:
+            df = self._read_disk(key)
+            if df is None:
+                df = load_sales(data, filename)
+                self._write_disk(key, df)
+            self._memory.put(key, df)
+        return key, df
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            # Parquet engine missing or file corrupt: fall back to parsing the upload
+            return None
+        os.utime(path)
+        return df
+
+    def _write_disk(self, key, df):
+        if not self.cache_dir:
+            return
+        try:
+            df.to_parquet(self._disk_path(key), index=False)
+        except Exception:
+            return
+        evict_oldest(self.cache_dir, '.parquet', self.max_disk_entries)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from .profiling import stage
+
+
+def inventory_recommendation(daily_sales, future_dates, current_inventory,
+                             lead_time_days, safety_stock_days):
+    # Calculate forecasted demand for lead time + safety stock period
+    total_period = lead_time_days + safety_stock_days
+    period_forecast = future_dates.head(total_period)['yhat'].sum()
+
+    # Calculate recommended order quantity
+    recommended_order = max(0, period_forecast - current_inventory)
+
+    avg_daily = daily_sales['y'].tail(30).mean() if len(daily_sales) >= 30 else daily_sales['y'].mean()
+    days_of_stock = current_inventory / avg_daily if avg_daily > 0 else float('inf')
+
+    return {
+        'current_inventory': current_inventory,
+        'total_period': total_period,
+        'period_forecast': period_forecast,
+        'recommended_order': recommended_order,
+        'avg_daily': avg_daily,
+        'days_of_stock': days_of_stock,
+    }
+
+
+def stock_status(days_of_stock, safety_stock_days):
+    return np.select(
+        [days_of_stock < safety_stock_days, days_of_stock < safety_stock_days * 2],
+        ['critical', 'warning'],
+        'good'
+    )
+
+
+def summarize_portfolio(df, safety_stock_days, min_rows=5):
+    """Stock, mean daily sales, days of stock and status for every SKU in one pass.
+
+    SKUs appear in the order they first occur in `df`; those with fewer than
+    `min_rows` rows are left out. Current stock is the last `on_hand_end` by
+    date (the last such row when a SKU has several rows on its last date).
+    """
+    with stage('summary', rows=len(df)):
+        return _summarize_portfolio(df, safety_stock_days, min_rows)
+
+
+def _summarize_portfolio(df, safety_stock_days, min_rows):
+    codes, skus = pd.factorize(df['sku'], sort=False)
+    n_skus, n_rows = len(skus), len(df)
+    if n_rows == 0:
+        return pd.DataFrame(columns=['sku', 'current_stock', 'avg_daily_sales', 'days_of_stock', 'status'])
+    day = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    day -= day.min()
+
+    rows = np.bincount(codes, minlength=n_skus)
+    # Blank cells count as zero, like the pandas sum this replaces
+    units = np.bincount(codes, weights=np.nan_to_num(df['units_sold'].to_numpy(dtype=float)), minlength=n_skus)
+
+    # Mean of the per-date totals = total units / number of distinct dates
+    span = int(day.max()) + 1
+    sku_day = codes.astype(np.int64) * span + day
+    if n_skus * span <= 50_000_000:
+        seen = np.zeros(n_skus * span, dtype=bool)
+        seen[sku_day] = True
+        n_dates = seen.reshape(n_skus, span).sum(axis=1)
+    else:
+        n_dates = np.bincount(pd.unique(sku_day) // span, minlength=n_skus)
+
+    # Latest (date, row position) per SKU, without sorting the frame
+    latest = np.full(n_skus, -1, dtype=np.int64)
+    np.maximum.at(latest, codes, day * n_rows + np.arange(n_rows))
+    current_stock = df['on_hand_end'].to_numpy()[latest % n_rows]
+
+    avg_daily_sales = units / n_dates
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_stock = np.where(avg_daily_sales > 0, current_stock / avg_daily_sales, np.inf)
+
+    keep = rows >= min_rows
+    return pd.DataFrame({
+        'sku': np.asarray(skus)[keep],
+        'current_stock': current_stock[keep],
+        'avg_daily_sales': avg_daily_sales[keep],
+        'days_of_stock': days_of_stock[keep],
+        'status': stock_status(days_of_stock[keep], safety_stock_days),
+    })
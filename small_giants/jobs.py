@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import LRUCache
+
+
+class QueueFull(RuntimeError):
+    """The job queue already holds its maximum number of unfinished jobs."""
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.id = uuid.uuid4().hex[:12]
+        self.status = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def set_progress(self, progress):
+        self.progress = progress
+
+
+class JobQueue:
+    """Background worker pool shared by every session, with request coalescing.
+
+    Jobs are identified by a key (e.g. data hash, SKU and config). Submitting a
+    key that is queued, running or recently finished returns that same job
+    instead of starting another computation. Failed jobs are returned too, so
+    callers can show the error, until a caller asks to `retry`. At
+    most `max_workers` jobs run at once and `submit()` raises `QueueFull`
+    beyond `max_pending` unfinished jobs. The last `max_finished` results are kept.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, max_finished=64):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='small-giants-job')
+        self._active = {}
+        self._finished = LRUCache(max_finished)
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, retry=False):
+        """Run `fn(*args, progress=job.set_progress)` in the background, or join an identical job."""
+        with self._lock:
+            job = self._active.get(key) or self._finished.get(key)
+            if job is not None and not (retry and job.status == 'failed'):
+                return job
+            if len(self._active) >= self.max_pending:
+                raise QueueFull(f"{len(self._active)} jobs already pending")
+            job = Job(key)
+            self._active[key] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._active.get(key) or self._finished.get(key)
+
+    def pending(self):
+        with self._lock:
+            return len(self._active)
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, progress=job.set_progress)
+            job.progress = 1.0
+            job.status = 'done'
+        except Exception as e:
+            job.error = e
+            job.status = 'failed'
+        job.finished_at = time.time()
+        with self._lock:
+            self._active.pop(job.key, None)
+            self._finished.put(job.key, job)
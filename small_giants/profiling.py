@@ -0,0 +1,134 @@
+"""Hot-path timing of pipeline stages, exported as JSON lines.
+
+Core functions wrap their expensive steps in `stage(name, **labels)`. That is
+a no-op unless a `StageTimer` is active in the current context, so the
+instrumentation costs nothing for callers that don't ask for timings.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('small_giants_stage_timer', default=None)
+
+_ITERATION_ROW = re.compile(r'^\s*(\d+)\s+\S')
+
+
+class StageTimer:
+    """Wall-clock seconds of each stage of one run (a Streamlit rerun, a batch job, ...)."""
+
+    def __init__(self, **labels):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.labels = labels
+        self.records = []
+
+    def record(self, name, seconds, **labels):
+        self.records.append({'stage': name, 'seconds': seconds, **labels})
+
+    @contextmanager
+    def stage(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.record(name, time.perf_counter() - start, **labels)
+
+    def install(self):
+        # For scripts that can't wrap their body in `activate()`, e.g. a Streamlit rerun
+        _current.set(self)
+        return self
+
+    @contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def extend(self, records, **labels):
+        self.records.extend({**record, **labels} for record in records)
+
+    def to_jsonl(self):
+        lines = []
+        for record in self.records:
+            lines.append(json.dumps({'run_id': self.run_id, 'ts': self.started_at, **self.labels, **record},
+                                    default=str))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write_jsonl(self, path):
+        with open(path, 'a') as f:
+            f.write(self.to_jsonl())
+
+
+@contextmanager
+def stage(name, **labels):
+    """Time the enclosed block into the active `StageTimer`, if any.
+
+    Yields the labels dict (None when no timer is active): keys added inside
+    the block, e.g. iteration counts known only after a fit, are recorded too.
+    """
+    timer = _current.get()
+    if timer is None:
+        yield None
+        return
+    with timer.stage(name, **labels) as labels:
+        yield labels
+
+
+def extend(records, **labels):
+    """Add records timed elsewhere, e.g. a worker process's `timings`, to the active `StageTimer`, if any."""
+    timer = _current.get()
+    if timer is not None:
+        timer.extend(records, **labels)
+
+
+def stan_iterations(model):
+    """L-BFGS iterations of a fitted Prophet model, read from cmdstan's console log (None if unavailable)."""
+    try:
+        stdout_files = model.stan_backend.stan_fit.runset.stdout_files
+        with open(stdout_files[0]) as f:
+            rows = [_ITERATION_ROW.match(line) for line in f]
+    except Exception:
+        return None
+    rows = [int(m.group(1)) for m in rows if m]
+    return rows[-1] if rows else None
+
+
+class RunProfiler:
+    """cProfile (calling thread only) and tracemalloc (whole process) capture for one run."""
+
+    def __init__(self, cpu=True, memory=True):
+        self.cpu = cProfile.Profile() if cpu else None
+        self.memory = memory
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        else:
+            self.memory = False
+        if self.cpu:
+            self.cpu.enable()
+        return self
+
+    def stop(self, top=25):
+        report = {}
+        if self.cpu:
+            self.cpu.disable()
+            out = io.StringIO()
+            pstats.Stats(self.cpu, stream=out).sort_stats('cumulative').print_stats(top)
+            report['cpu'] = out.getvalue()
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report['peak_bytes'] = peak
+            report['memory'] = [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+        return report
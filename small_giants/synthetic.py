@@ -0,0 +1,57 @@
+"""Reproducible synthetic sales for offline benchmarks and backtests."""
+import numpy as np
+import pandas as pd
+
+FAMILIES = ['CRACKER', 'PUFFS', 'TARALLI', 'PASTA-GRILLO', 'FARINA-GRILLO', 'INSETTI-MIX',
+            'BARRETTE', 'GRATTUGIATO']
+
+
+def generate_sales(n_skus, n_days, start='2023-01-01', seed=0, intermittent_share=0.2,
+                   lead_time_days=7):
+    """N SKUs x D days of sales in the upload format (date, sku, units_sold, on_hand_end).
+
+    Demand is Poisson around a per-SKU level with trend, weekly and yearly
+    seasonality; `intermittent_share` of the SKUs sell rarely. Stock follows
+    a reorder-point policy with a fixed lead time, and some SKUs get reorder
+    points low enough to run out, so sales are censored by stockouts.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+
+    level = rng.gamma(2.0, 4.0, n_skus)
+    intermittent = rng.random(n_skus) < intermittent_share
+    level[intermittent] = rng.uniform(0.05, 0.5, intermittent.sum())
+    trend = rng.normal(0, 0.3, n_skus) / 365
+    weekly = rng.uniform(0, 0.4, n_skus)[:, None] * np.sin(2 * np.pi * (t + rng.integers(0, 7, n_skus)[:, None]) / 7)
+    yearly = rng.uniform(0, 0.5, n_skus)[:, None] * np.sin(2 * np.pi * t / 365.25)
+    rate = np.maximum(level[:, None] * (1 + trend[:, None] * t) * (1 + weekly + yearly), 0)
+    demand = rng.poisson(rate)
+
+    # Reorder point policy; a third of the SKUs are under-stocked and stock out
+    daily = level * (1 + weekly.max(axis=1))
+    reorder_point = daily * lead_time_days * np.where(rng.random(n_skus) < 1 / 3, 0.5, 1.5)
+    order_up_to = reorder_point + daily * 30
+    stock = np.ceil(order_up_to)
+    arrival_day = np.full(n_skus, -1)
+    arrival_qty = np.zeros(n_skus)
+    sales = np.empty((n_skus, n_days), dtype=np.int64)
+    on_hand = np.empty((n_skus, n_days), dtype=np.int64)
+    for d in range(n_days):
+        arriving = arrival_day == d
+        stock[arriving] += arrival_qty[arriving]
+        arrival_day[arriving] = -1
+        sold = np.minimum(demand[:, d], stock)
+        stock -= sold
+        reorder = (stock <= reorder_point) & (arrival_day < 0)
+        arrival_day[reorder] = d + lead_time_days
+        arrival_qty[reorder] = np.ceil(order_up_to[reorder] - stock[reorder])
+        sales[:, d] = sold
+        on_hand[:, d] = stock
+
+    skus = [f"{FAMILIES[i % len(FAMILIES)]}-{i:05d}" for i in range(n_skus)]
+    return pd.DataFrame({
+        'date': np.tile(pd.date_range(start, periods=n_days, freq='D'), n_skus),
+        'sku': np.repeat(skus, n_days),
+        'units_sold': sales.ravel(),
+        'on_hand_end': on_hand.ravel(),
+    })